@@ -10,6 +10,21 @@ class AnchorUpdater:
         self.config = config.config
         self.orchestrator = orchestrator
 
+        # Set when the last change couldn't be applied
+        self.pending = False
+        self.orchestrator.wireguard.anchor.subscribe(self.on_anchor)
+
+    # conf or subdomains changed
+    def on_anchor(self, data):
+        if self.config['wgRegistered'] and self.config['wgOn']:
+            Log.log("Anchor: Anchor information changed")
+            self.pending = not self.apply(data)
+
+    def apply(self, data):
+        if self.orchestrator.wireguard.update_wg_config(data['conf']):
+            return self.update_urbit()
+        return False
+
     # Get updated Anchor information every 12 hours
     def anchor_loop(self):
         Log.log("Anchor: Anchor information updater thread started")
@@ -17,7 +32,7 @@ class AnchorUpdater:
         while True:
             endpoint = self.config['endpointUrl']
             api_version = self.config['apiVersion']
-            url = f"https://{endpoint}/{api_version}"
+            url = f"{self.config['endpointScheme']}://{endpoint}/{api_version}"
 
             try:
                 self.orchestrator.wireguard.get_regions(url)
@@ -26,50 +41,35 @@ class AnchorUpdater:
 
             if self.config['wgRegistered'] and self.config['wgOn']:
                 try:
-                    if self.orchestrator.wireguard.get_status(url):
-                        wg_conf = self.orchestrator.wireguard.anchor_data['conf']
-                        if self.orchestrator.wireguard.update_wg_config(wg_conf):
-                            if self.update_urbit():
-                                time.sleep((60 * 60 * 12) - 60)
+                    # changes reach on_anchor, only retry here if applying one failed
+                    if self.orchestrator.wireguard.get_status(url, max_age=0):
+                        if self.pending:
+                            self.pending = not self.apply(self.orchestrator.wireguard.anchor_data)
+                        # wait out the 12 hours, less if a change couldn't be applied
+                        slept = 0
+                        while slept < (60 * 60 * 12) - 60 and not self.pending:
+                            time.sleep(60)
+                            slept += 60
 
-                except Exception:
-                    Log.log("Anchor: Failed to get updated anchor information: {e}")
+                except Exception as e:
+                    Log.log(f"Anchor: Failed to get updated anchor information: {e}")
 
             time.sleep(60)
 
     def update_urbit(self):
         try:
-            for patp in self.orchestrator.urbit._urbits:
-                svc_url = None
-                http_port = None
-                http_alias = None
-                ames_port = None
-                s3_port = None
-                console_port = None
-                pub_url = '.'.join(self.config['endpointUrl'].split('.')[1:])
-
-                for ep in self.orchestrator.wireguard.anchor_data['subdomains']:
-                    if ep['status'] == 'ok':
-                        if f'{patp}.{pub_url}' == ep['url']:
-                            svc_url = ep['url']
-                            http_port = ep['port']
-                            http_alias = ep['alias']
-                        elif f'ames.{patp}.{pub_url}' == ep['url']:
-                            ames_port = ep['port']
-                        elif f'bucket.s3.{patp}.{pub_url}' == ep['url']:
-                            s3_port = ep['port']
-                        elif f'console.s3.{patp}.{pub_url}' == ep['url']:
-                            console_port = ep['port']
-
-                if None not in [svc_url, http_port, ames_port, s3_port, console_port, http_alias]:
-                    if not self.orchestrator.urbit.update_wireguard_network(
+            urb = self.orchestrator.urbit
+            for patp in urb._urbits:
+                ep = urb.anchor_endpoints(patp)
+                if ep is not None and ep['alias'] is not None:
+                    if not urb.update_wireguard_network(
                             patp,
-                            svc_url,
-                            http_port,
-                            ames_port,
-                            s3_port,
-                            console_port,
-                            http_alias):
+                            ep['url'],
+                            ep['http'],
+                            ep['ames'],
+                            ep['s3'],
+                            ep['console'],
+                            ep['alias']):
                         raise Exception("Unable to update wireguard network")
             return True
         except Exception as e:
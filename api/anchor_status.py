@@ -0,0 +1,199 @@
+# Python
+import json
+import random
+import hashlib
+from time import sleep, monotonic
+from threading import Thread, Lock, Condition
+
+# GroundSeg modules
+from log import Log
+
+class AnchorStatus:
+
+    # Seconds a /retrieve answer is reused
+    _ttl = 30
+
+    # What a subscriber is told about unless it asks for other fields
+    _fields = ['conf', 'subdomains']
+
+    # Seconds between polls while someone waits on the anchor, and the most
+    _poll_min = 2
+    _poll_max = 60
+
+    # Owns /retrieve: the latest answer, a hash of what matters in it, and who to tell
+    def __init__(self, api, config):
+        self.api = api
+        self.config = config
+        self.data = {}
+        self.etag = None
+        self._fetched = 0
+
+        # (patp, svc_type) -> {url, port, alias, status}
+        self.index = {}
+        self._subscribers = []
+        self._notify_lock = Lock()
+        self._seen = None
+
+        # Waiters on data, woken by a single poller
+        self._cond = Condition()
+        self._waiters = 0
+        self._poller = None
+
+    # Called with the new data when any of fields (conf and subdomains by default) change,
+    # and once with what's cached already
+    def subscribe(self, fn, fields=None):
+        self._subscribers.append({"fn": fn, "fields": fields or self._fields, "delivered": None})
+        with self._cond:
+            cached = len(self.data) > 0
+        if cached:
+            Thread(target=self._notify, daemon=True).start()
+
+    # Latest data, fetched again if older than max_age. None if /retrieve failed every try.
+    def get(self, url, max_age=None, tries=6):
+        if max_age is None:
+            max_age = self._ttl
+        if len(self.data) > 0 and monotonic() - self._fetched < max_age:
+            return self.data
+
+        for n in range(tries):
+            try:
+                return self.refresh(url)
+            except Exception as e:
+                Log.log(f"Anchor: /retrieve failed: {e}")
+                if n < tries - 1:
+                    t = self.api.backoff(n)
+                    Log.log(f"Anchor: Attempting /retrieve again in {t:.1f} seconds")
+                    sleep(t)
+        return None
+
+    # One /retrieve, shared with anyone else asking at the same time
+    def refresh(self, url):
+        data = self.api.retrieve(url, self.config['pubkey'])
+        if data['conf'] is None:
+            raise Exception(f"conf is null: {data}")
+
+        etag = self._hash(data)
+        seen = self._hash(data, self._watched())
+
+        with self._cond:
+            changed = seen != self._seen
+            if etag != self.etag:
+                self.index = self._build_index(data)
+            self.data = data
+            self.etag = etag
+            self._seen = seen
+            self._fetched = monotonic()
+            self._cond.notify_all()
+
+        if changed:
+            Thread(target=self._notify, daemon=True).start()
+        return data
+
+    # Endpoint for a pier's service, None if the anchor doesn't have it
+    def service(self, patp, svc_type):
+        return self.index.get((patp, svc_type))
+
+    # Next get goes to StarTram, after anything that changes the anchor
+    def invalidate(self):
+        self._fetched = 0
+
+    def reset(self):
+        with self._cond:
+            self.data = {}
+            self.etag = None
+            self._fetched = 0
+            self._seen = None
+            self.index = {}
+        for sub in self._subscribers:
+            sub['delivered'] = None
+
+    # Wait until ready(data) is true, every waiter shares one poller
+    def wait_for(self, url, ready, timeout=900):
+        deadline = monotonic() + timeout
+        with self._cond:
+            self._waiters += 1
+            if self._poller is None:
+                self._poller = Thread(target=self._poll, args=(url,), daemon=True)
+                self._poller.start()
+            try:
+                while True:
+                    if len(self.data) > 0 and ready(self.data):
+                        return True
+                    left = deadline - monotonic()
+                    if left <= 0:
+                        return False
+                    self._cond.wait(left)
+            finally:
+                self._waiters -= 1
+
+    # Poll while anyone is waiting, backing off from _poll_min to _poll_max with jitter
+    def _poll(self, url):
+        n = 0
+        while True:
+            with self._cond:
+                if self._waiters < 1:
+                    self._poller = None
+                    return
+            try:
+                self.refresh(url)
+            except Exception as e:
+                Log.log(f"Anchor: /retrieve failed: {e}")
+
+            t = random.uniform(self._poll_min, min(self._poll_max, self._poll_min * (2 ** n)))
+            n = min(n + 1, 8)
+            sleep(t)
+
+    # Subdomains look like [svc.]<patp>.<pub_url>, pub_url being endpointUrl without its first label
+    def _build_index(self, data):
+        pub_url = '.'.join(self.config['endpointUrl'].split('.')[1:])
+        index = {}
+        for ep in data.get('subdomains') or []:
+            try:
+                suffix = f".{pub_url}"
+                if not ep['url'].endswith(suffix):
+                    raise Exception(f"not under {pub_url}")
+                patp = ep['url'][:-len(suffix)].split('.')[-1]
+
+                # an ok endpoint wins over a duplicate that isn't
+                key = (patp, ep['svc_type'])
+                if key in index and index[key]['status'] == 'ok' and ep.get('status') != 'ok':
+                    continue
+                index[key] = {
+                        "url": ep['url'],
+                        "port": ep.get('port'),
+                        "alias": ep.get('alias'),
+                        "status": ep.get('status')
+                        }
+            except Exception as e:
+                Log.log(f"Anchor: Skipping subdomain {ep}: {e}")
+        return index
+
+    # Every field some subscriber acts on
+    def _watched(self):
+        fields = set(self._fields)
+        for sub in self._subscribers:
+            fields.update(sub['fields'])
+        return sorted(fields)
+
+    # Only the given fields count, conf and subdomains unless told otherwise
+    def _hash(self, data, fields=None):
+        keep = {k: data.get(k) for k in fields or self._fields}
+        return hashlib.sha256(json.dumps(keep, sort_keys=True).encode()).hexdigest()
+
+    # One change at a time, always the latest, each subscriber only for its own fields
+    def _notify(self):
+        with self._notify_lock:
+            with self._cond:
+                data = self.data
+            if len(data) < 1:
+                return
+
+            for sub in list(self._subscribers):
+                h = self._hash(data, sub['fields'])
+                if h == sub['delivered']:
+                    continue
+                sub['delivered'] = h
+                try:
+                    sub['fn'](data)
+                except Exception as e:
+                    Log.log(f"Anchor: Subscriber failed: {e}")
@@ -0,0 +1,264 @@
+# Python
+import io
+import os
+import stat
+import queue
+import hashlib
+import tarfile
+import zipfile
+from threading import Thread, Event
+
+# Flask
+from flask import Response
+
+# Modules
+import zstandard
+
+# GroundSeg modules
+from log import Log
+
+class ArchiveStreamer:
+
+    # Bytes per chunk handed to the response
+    _chunk_size = 1024 * 1024
+
+    # Chunks buffered between the compressor and the client
+    _queue_size = 16
+
+    # format: (mimetype, default level, min level, max level)
+    formats = {
+            "zip": ("application/zip", 6, 0, 9),
+            "tar": ("application/x-tar", None, None, None),
+            "tar.zst": ("application/zstd", 3, 1, 22)
+            }
+
+    # Archive root/sub with names relative to root
+    def __init__(self, name, root, sub='', fmt='zip', level=None, skip=[]):
+        if fmt not in self.formats:
+            raise Exception(f"Unsupported export format '{fmt}'")
+
+        mimetype, default, low, high = self.formats[fmt]
+        if level is None:
+            level = default
+        elif default is not None:
+            level = min(max(int(level), low), high)
+
+        self.name = name
+        self.root = root
+        self.fmt = fmt
+        self.level = level
+        self.mimetype = mimetype
+        self.file_name = f"{name}.{fmt}"
+        self.members = self._scan(os.path.join(root, sub), skip)
+
+        # Uncompressed tar has a known layout, which allows ranges
+        if fmt != "zip":
+            self._layout, self._tar_size = self._tar_layout()
+
+        h = hashlib.sha1(fmt.encode())
+        for full, arc, st in self.members:
+            h.update(f"{arc}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+        self.etag = h.hexdigest()
+
+    # Flask response streaming the archive, rng is request.range
+    def response(self, rng=None, if_range=None):
+        headers = {"Content-Disposition": f"attachment; filename={self.file_name}"}
+        status = 200
+        start, stop = 0, None
+
+        if self.fmt == "tar":
+            stop = self._tar_size
+            headers['Accept-Ranges'] = "bytes"
+            headers['ETag'] = f'"{self.etag}"'
+
+            # resume only if the pier hasn't changed since the first request
+            span = None
+            if rng is not None:
+                if not if_range or if_range.replace('W/', '').strip('"') == self.etag:
+                    span = rng.range_for_length(self._tar_size)
+
+            if span is not None:
+                start, stop = span
+                status = 206
+                headers['Content-Range'] = f"bytes {start}-{stop - 1}/{self._tar_size}"
+
+            headers['Content-Length'] = str(stop - start)
+        else:
+            headers['Accept-Ranges'] = "none"
+
+        Log.log(f"{self.name}: Streaming {self.file_name} from byte {start}")
+        return Response(self._stream(start, stop), status=status,
+                        mimetype=self.mimetype, headers=headers, direct_passthrough=True)
+
+    # Regular files under path, in a stable order
+    def _scan(self, path, skip):
+        members = []
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for file in sorted(files):
+                full = os.path.join(root, file)
+                if file in skip:
+                    Log.log(f"{self.name}: Skipping {file} while compressing")
+                    continue
+                try:
+                    st = os.lstat(full)
+                except OSError:
+                    continue
+                if stat.S_ISREG(st.st_mode):
+                    members.append((full, os.path.relpath(full, self.root), st))
+        return members
+
+    # Consume the archive in the response thread, build it in a worker
+    def _stream(self, start, stop):
+        pipe = _Pipe(self._queue_size, self._chunk_size)
+        Thread(target=self._produce, args=(pipe, start, stop), daemon=True).start()
+        try:
+            while True:
+                chunk = pipe.queue.get()
+                if chunk is None:
+                    break
+                yield chunk
+            if pipe.error is not None:
+                raise pipe.error
+        finally:
+            pipe.cancel.set()
+
+    def _produce(self, pipe, start, stop):
+        try:
+            if self.fmt == "zip":
+                method = zipfile.ZIP_DEFLATED if self.level > 0 else zipfile.ZIP_STORED
+                with zipfile.ZipFile(pipe, 'w', method, compresslevel=self.level or None) as zipf:
+                    for full, arc, st in self.members:
+                        zipf.write(full, arcname=arc)
+
+            elif self.fmt == "tar":
+                for chunk in self._tar_chunks(start, stop):
+                    pipe.write(chunk)
+
+            else:
+                cobj = zstandard.ZstdCompressor(level=self.level).compressobj()
+                for chunk in self._tar_chunks(0, self._tar_size):
+                    out = cobj.compress(chunk)
+                    if out:
+                        pipe.write(out)
+                pipe.write(cobj.flush())
+
+            pipe.flush()
+            Log.log(f"{self.name}: Export finished")
+
+        except BrokenPipeError:
+            Log.log(f"{self.name}: Export cancelled by client")
+        except Exception as e:
+            Log.log(f"{self.name}: Export failed: {e}")
+            pipe.error = e
+        finally:
+            pipe.finish()
+
+    # Header and data size of every member, and the total tar size
+    def _tar_layout(self):
+        layout = []
+        pos = 0
+        for full, arc, st in self.members:
+            t = tarfile.TarInfo(arc)
+            t.size = st.st_size
+            t.mtime = int(st.st_mtime)
+            t.mode = stat.S_IMODE(st.st_mode)
+            t.uid = st.st_uid
+            t.gid = st.st_gid
+            header = t.tobuf(tarfile.GNU_FORMAT, "utf-8", "surrogateescape")
+            layout.append((header, full, st.st_size))
+            pos += len(header) + st.st_size + (-st.st_size % tarfile.BLOCKSIZE)
+
+        # two empty blocks, padded to a full record
+        pos += tarfile.BLOCKSIZE * 2
+        pos += -pos % tarfile.RECORDSIZE
+        return layout, pos
+
+    # Bytes start to stop of the tar, reading only the members in that span
+    def _tar_chunks(self, start, stop):
+        pos = 0
+        for header, full, size in self._layout:
+            pad = -size % tarfile.BLOCKSIZE
+            end = pos + len(header) + size + pad
+            if end > start and pos < stop:
+                yield from self._tar_member(header, full, size, pad, start - pos, stop - pos)
+            pos = end
+            if pos >= stop:
+                return
+
+        trailer = self._tar_size - pos
+        first, last = max(start - pos, 0), min(stop - pos, trailer)
+        if last > first:
+            yield bytes(last - first)
+
+    # start and stop are relative to the member's header
+    def _tar_member(self, header, full, size, pad, start, stop):
+        hlen = len(header)
+        if start < hlen:
+            yield header[max(start, 0):min(stop, hlen)]
+
+        first, last = max(start - hlen, 0), min(stop - hlen, size)
+        if last > first:
+            with open(full, 'rb') as f:
+                f.seek(first)
+                left = last - first
+                while left > 0:
+                    buf = f.read(min(self._chunk_size, left))
+                    if not buf:
+                        # file shrank, keep the advertised layout
+                        buf = bytes(min(self._chunk_size, left))
+                    left -= len(buf)
+                    yield buf
+
+        first, last = max(start - hlen - size, 0), min(stop - hlen - size, pad)
+        if last > first:
+            yield bytes(last - first)
+
+
+# Unseekable file handing chunks to the response through a bounded queue
+class _Pipe(io.RawIOBase):
+    def __init__(self, size, chunk_size):
+        self.queue = queue.Queue(maxsize=size)
+        self.cancel = Event()
+        self.error = None
+        self._chunk_size = chunk_size
+        self._buf = bytearray()
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def write(self, b):
+        n = len(b)
+        self._buf += b
+        self._pos += n
+        if len(self._buf) >= self._chunk_size:
+            self._put(bytes(self._buf))
+            self._buf = bytearray()
+        return n
+
+    def flush(self):
+        if len(self._buf) > 0 and not self.cancel.is_set():
+            self._put(bytes(self._buf))
+            self._buf = bytearray()
+
+    # End of archive
+    def finish(self):
+        try:
+            self._put(None)
+        except BrokenPipeError:
+            pass
+
+    # Block while the client is behind, give up if it went away
+    def _put(self, item):
+        while True:
+            if self.cancel.is_set():
+                raise BrokenPipeError("client disconnected")
+            try:
+                self.queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
@@ -89,6 +89,14 @@ class BugReport:
                         Log.log(f"Bug: Failed to load {j}: {e}")
                         bug_file.writestr(f"failed_{j}", e)
 
+                # single file pier store
+                if os.path.isfile(f"{base_path}/settings/piers.json"):
+                    with open(f"{base_path}/settings/piers.json") as f:
+                        piers = json.load(f)
+                    for p in piers.values():
+                        p.pop("minio_password", None)
+                    bug_file.writestr("piers.json", json.dumps(piers, indent = 4))
+
             except Exception as e:
                 Log.log(f"Bug: Failed to load pier configs: {e}")
                 bug_file.writestr("pier_cfgs_failed", e)
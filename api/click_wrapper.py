@@ -1,4 +1,3 @@
-import os
 from log import Log
 
 class Click:
@@ -9,36 +8,22 @@ class Click:
 
     def run(self, payload={}):
         try:
+            hoon = self.get_hoon(self.name, payload)
+            res = self.urb.run_thread(self.patp, self.name, hoon)
+
             # code
             if self.name == "code":
-                if self.create_hoon():
-                    raw = self.click_exec(
-                            self.patp,
-                            self.urb.urb_docker.exec,
-                            f"{self.name}.hoon",
-                            True
-                            )
-                    self.delete_hoon()
-                    return self.filter_code(raw)
+                return self.filter_code(res)
 
             # s3
             if self.name in ["s3","s3-legacy"]:
-                if self.create_hoon(payload):
-                    raw = self.click_exec(
-                            self.patp,
-                            self.urb.urb_docker.exec,
-                            f"{self.name}.hoon",
-                            True
-                            )
-                    self.delete_hoon()
-                return self.filter_success(raw)
+                return self.filter_success(res)
 
         except Exception as e:
             Log.log(f"(WS)Click: run() failed: {e}")
         return None
 
-    def click_exec(self, patp, docker_exec, hoon_file, from_wrapper=False):
-        #if from_wrapper:
+    def click_exec(self, patp, docker_exec, hoon_file):
         out = docker_exec(patp, f"click -b urbit -kp -i {hoon_file} {patp}").output.decode("utf-8").strip().split("\n")
         avow = False
         result = ""
@@ -52,52 +37,29 @@ class Click:
 
         return {"trace":trace,"result":result.strip()}
 
-    #
-    #   Hoon file builder
-    #
-
-    # Create
-    def create_hoon(self, payload={}):
-        try:
-            hoon_file = f"{self.urb._volume_directory}/{self.patp}/_data/{self.name}.hoon"
-            with open(hoon_file,'w') as f :
-                f.write(self.get_hoon(self.name, payload))
-                f.close()
-        except Exception:
-            Log.log(f"{patp}: Creating {self.name}.hoon failed")
-            return False
-        return True
-
-    # Delete
-    def delete_hoon(self):
-        try:
-            hoon_file = f"{self.urb._volume_directory}/{self.patp}/_data/{self.name}.hoon"
-            if os.path.exists(hoon_file):
-                os.remove(hoon_file)
-        except Exception as e:
-            Log.log(f"{self.patp}: Deleting {self.name}.hoon failed: {e}")
-            return False
-        return True
+    # click output in the same shape as a conn.sock result
+    def to_result(self, raw):
+        result = str(raw['result'])
+        if len(result) > 0:
+            return {"ok": True, "value": result.split(' ')[-1][1:-1], "trace": raw['trace']}
+        return {"ok": False, "value": None, "trace": raw['trace']}
 
     #
     #   Filters
     #
 
     # +code
-    def filter_code(self, data):
-        code = "not-yet"
-        result = str(data['result'])
-        if len(str(result)) > 0:
-            res = result.split(' ')[-1][1:-1]
-            if len(res) == 27:
-                code = res
-        else:
+    def filter_code(self, res):
+        if not res['ok']:
             return False
-        return code
+        code = str(res['value'])
+        if len(code) == 27:
+            return code
+        return "not-yet"
 
     # |pack and |meld
-    def filter_success(self, data):
-        return 'success' in str(data['result'])
+    def filter_success(self, res):
+        return res['ok'] and 'success' in str(res['value'])
 
     #
     #   Hoon
@@ -17,6 +17,8 @@ from crontab import CronTab
 # GroundSeg Modules
 from log import Log
 from utils import Utils
+from debounced_writer import DebouncedWriter
+from session_store import SessionStore
 
 class Config:
 
@@ -73,11 +75,12 @@ class Config:
             "firstBoot": True,
             "piers": [],
             "endpointUrl": "api.startram.io",
+            "endpointScheme": "https",
             "apiVersion": "v1",
             "wgRegistered": False,
             "wgOn": False,
             "updateMode": "auto",
-            "sessions": [],
+            "sessions": {},
             "pwHash": "",
             "updateBranch": "latest",
             "updateUrl": "https://version.groundseg.app",
@@ -86,6 +89,8 @@ class Config:
             "dockerData": "/var/lib/docker",
             "swapFile": "/opt/nativeplanet/groundseg/swapfile",
             "swapVal": 16,
+            "bootWorkers": 4,
+            "pierStoreSingleFile": False,
             "linuxUpdates": {
                 "value": 1,         # Int
                 "interval": "week", # day hour minute
@@ -111,6 +116,12 @@ class Config:
 
         # load existing or create new system.json
         self.config = self.load_config(self.config_file)
+        self._writer = DebouncedWriter(self.config_file,
+                                       lambda: json.dumps(self.config, indent = 4),
+                                       "Config")
+
+        # login sessions, kept in config['sessions']
+        self.sessions = SessionStore(self)
 
         # fix updateMode if set to temp
         if self.config['updateMode'] == 'temp':
@@ -156,7 +167,12 @@ class Config:
                 cfg = json.load(f)
         except Exception as e:
             Log.log(f"Config: Failed to open system.json: {e}")
-            Log.log("Config: New system.json will be created")
+            try:
+                with open(f"{config_file}.bak") as f:
+                    cfg = json.load(f)
+                Log.log("Config: Restored system.json from last backup")
+            except Exception:
+                Log.log("Config: New system.json will be created")
 
         cfg['gsVersion'] = self.version
         cfg['CFG_DIR'] = self.base_path
@@ -353,12 +369,10 @@ class Config:
         return arch
 
 
-    # Save config
+    # Save config, written in the background shortly after
     def save_config(self):
-        with open(self.config_file, 'w') as f:
-            Log.log("Config: Saving system.json")
-            json.dump(self.config, f, indent = 4)
-            return True
+        self._writer.schedule()
+        return True
 
 
     def fixer_script(self):
@@ -0,0 +1,202 @@
+# Python
+import socket
+from time import monotonic
+from threading import Thread, Lock, Event
+
+# GroundSeg modules
+from log import Log
+from noun import Noun
+
+class ConnPool:
+
+    # Seconds to wait for a thread result
+    _timeout = 60
+
+    # Seconds before trying a ship's conn.sock again after it failed
+    _retry_after = 30
+
+    # One connection per ship to <pier>/.urb/conn.sock, through the docker volume
+    def __init__(self, volume_directory):
+        self._volume_directory = volume_directory
+        self._conns = {}
+        self._failed = {}
+        self._lock = Lock()
+
+    # Run a hoon thread through khan. Returns {ok, value, trace},
+    # or None if the ship can't be reached this way.
+    def thread(self, patp, hoon, timeout=None):
+        conn = self._get(patp)
+        if conn is None:
+            return None
+
+        req = Noun.cell(Noun.cord('fyrd'),
+                        Noun.cord('base'),
+                        Noun.cord('eval'),
+                        Noun.cord('noun'),
+                        Noun.cord('ted-eval'),
+                        Noun.cord(hoon))
+        try:
+            res = conn.request(req, timeout or self._timeout)
+        except Exception as e:
+            Log.log(f"{patp}: conn.sock request failed: {e}")
+            self._drop(patp, conn)
+            return None
+
+        # the thread may still be running, don't run it again another way
+        if res is None:
+            return {"ok": False, "value": None, "trace": "timed out"}
+        return self._result(res)
+
+    # Close a ship's connection, the next request reconnects
+    def close(self, patp):
+        with self._lock:
+            conn = self._conns.pop(patp, None)
+            self._failed.pop(patp, None)
+        if conn is not None:
+            conn.close()
+
+    def _get(self, patp):
+        with self._lock:
+            conn = self._conns.get(patp)
+            if conn is not None and conn.alive:
+                return conn
+
+            failed = self._failed.get(patp)
+            if failed is not None and monotonic() - failed < self._retry_after:
+                return None
+
+            path = f"{self._volume_directory}/{patp}/_data/{patp}/.urb/conn.sock"
+            try:
+                conn = _Conn(patp, path)
+            except Exception as e:
+                Log.log(f"{patp}: conn.sock unavailable: {e}")
+                self._failed[patp] = monotonic()
+                self._conns.pop(patp, None)
+                return None
+
+            Log.log(f"{patp}: Connected to conn.sock")
+            self._failed.pop(patp, None)
+            self._conns[patp] = conn
+            return conn
+
+    def _drop(self, patp, conn):
+        with self._lock:
+            if self._conns.get(patp) is conn:
+                self._conns.pop(patp)
+            self._failed[patp] = monotonic()
+        conn.close()
+
+    # [%avow p=(each page goof)]
+    def _result(self, res):
+        try:
+            tag, (flag, body) = res
+            if Noun.text(tag) != 'avow':
+                raise Exception(f"unexpected %{Noun.text(tag)}")
+
+            if flag == 0:
+                mark, value = body
+                if type(value) is not tuple:
+                    value = Noun.text(value)
+                return {"ok": True, "value": value, "trace": ""}
+
+            # goof is [mote tang], the mote says what went wrong
+            mote = body[0] if type(body) is tuple else body
+            return {"ok": False, "value": None, "trace": Noun.text(mote)}
+        except Exception as e:
+            return {"ok": False, "value": None, "trace": f"bad response: {e}"}
+
+
+# A socket with requests in flight, matched to responses by request id
+class _Conn:
+    _connect_timeout = 2
+
+    def __init__(self, patp, path):
+        self.patp = patp
+        self.alive = True
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(self._connect_timeout)
+        try:
+            self._sock.connect(path)
+        except Exception:
+            self._sock.close()
+            raise
+        self._sock.settimeout(None)
+
+        self._next = 1
+        self._pending = {}
+        self._lock = Lock()
+        self._send_lock = Lock()
+        self._reader = Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    # Send [rid request] and wait for [rid response], None on timeout
+    def request(self, noun, timeout):
+        with self._lock:
+            if not self.alive:
+                raise Exception("connection closed")
+            rid = self._next
+            self._next += 1
+            waiter = [Event(), None]
+            self._pending[rid] = waiter
+
+        atom = Noun.jam((rid, noun))
+        data = atom.to_bytes((atom.bit_length() + 7) // 8, 'little')
+        # newt framing: version byte, then little endian length
+        frame = b'\x00' + len(data).to_bytes(4, 'little') + data
+        try:
+            with self._send_lock:
+                self._sock.sendall(frame)
+        except Exception:
+            with self._lock:
+                self._pending.pop(rid, None)
+            raise
+
+        if not waiter[0].wait(timeout):
+            with self._lock:
+                self._pending.pop(rid, None)
+            return None
+        if isinstance(waiter[1], Exception):
+            raise waiter[1]
+        return waiter[1]
+
+    def close(self):
+        self._fail(Exception("connection closed"))
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+    def _read_loop(self):
+        try:
+            while True:
+                head = self._recv(5)
+                data = self._recv(int.from_bytes(head[1:], 'little'))
+                rid, res = Noun.cue(int.from_bytes(data, 'little'))
+                with self._lock:
+                    waiter = self._pending.pop(rid, None)
+                if waiter is not None:
+                    waiter[1] = res
+                    waiter[0].set()
+        except Exception as e:
+            if self.alive:
+                Log.log(f"{self.patp}: conn.sock closed: {e}")
+            self._fail(e)
+
+    def _recv(self, n):
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = self._sock.recv(n - len(buf))
+            if not chunk:
+                raise Exception("connection closed by ship")
+            buf += chunk
+        return bytes(buf)
+
+    # Wake everyone waiting, the ship won't answer on this socket
+    def _fail(self, e):
+        with self._lock:
+            self.alive = False
+            pending, self._pending = self._pending, {}
+        for waiter in pending.values():
+            waiter[1] = e
+            waiter[0].set()
@@ -0,0 +1,120 @@
+# Python
+import time
+from threading import Thread, Lock, Event
+
+# Modules
+import docker
+
+# GroundSeg modules
+from log import Log
+
+client = docker.from_env()
+
+class ContainerCache:
+
+    # name -> docker Container, kept current by the docker event stream
+    _containers = {}
+    _lock = Lock()
+
+    # Set while the cache matches docker, a miss then means the container doesn't exist
+    _synced = Event()
+    _watcher = None
+    _watcher_lock = Lock()
+
+    # Seconds to wait before resubscribing after the event stream drops
+    _retry = 5
+
+    # Container events that change status or attrs
+    _actions = ('create','start','restart','stop','die','kill','pause','unpause',
+                'oom','rename','update','destroy','health_status')
+
+    # Cached container, or a live handle from docker
+    def get(name, live=False):
+        ContainerCache._start_watcher()
+        if live or not ContainerCache._synced.is_set():
+            return ContainerCache.refresh(name)
+
+        with ContainerCache._lock:
+            return ContainerCache._containers.get(name, False)
+
+    # All cached containers
+    def list():
+        ContainerCache._start_watcher()
+        if not ContainerCache._synced.is_set():
+            ContainerCache._sync()
+
+        with ContainerCache._lock:
+            return dict(ContainerCache._containers)
+
+    # Fetch a container from docker and update the cache
+    def refresh(name):
+        try:
+            c = client.containers.get(name)
+        except docker.errors.NotFound:
+            c = False
+        except Exception as e:
+            Log.log(f"Containers: Failed to get {name}: {e}")
+            return False
+
+        with ContainerCache._lock:
+            if c:
+                ContainerCache._containers[c.name] = c
+            else:
+                ContainerCache._containers.pop(name, None)
+        return c
+
+    # Start following docker events
+    def _start_watcher():
+        if ContainerCache._watcher is not None:
+            return
+        with ContainerCache._watcher_lock:
+            if ContainerCache._watcher is None:
+                ContainerCache._watcher = Thread(target=ContainerCache._watch, daemon=True)
+                ContainerCache._watcher.start()
+
+    def _watch():
+        while True:
+            try:
+                # subscribe before listing so nothing between the two is missed
+                events = client.events(decode=True, filters={'type':'container'})
+                ContainerCache._sync()
+                for e in events:
+                    ContainerCache._handle(e)
+            except Exception as e:
+                Log.log(f"Containers: Event stream stopped: {e}")
+
+            ContainerCache._synced.clear()
+            time.sleep(ContainerCache._retry)
+
+    # Replace the cache with a full listing
+    def _sync():
+        try:
+            containers = {c.name: c for c in client.containers.list(all=True)}
+        except Exception as e:
+            Log.log(f"Containers: Failed to list containers: {e}")
+            return False
+
+        with ContainerCache._lock:
+            ContainerCache._containers = containers
+        ContainerCache._synced.set()
+        return True
+
+    def _handle(e):
+        action = e.get('Action') or e.get('status') or ''
+        action = action.split(':')[0]
+        if action not in ContainerCache._actions:
+            return
+
+        name = e.get('Actor', {}).get('Attributes', {}).get('name')
+        if not name:
+            return
+
+        if action == 'destroy':
+            with ContainerCache._lock:
+                ContainerCache._containers.pop(name, None)
+        else:
+            if action == 'rename':
+                with ContainerCache._lock:
+                    ContainerCache._containers = {n: c for n, c in ContainerCache._containers.items()
+                                                  if c.id != e.get('Actor', {}).get('ID')}
+            ContainerCache.refresh(name)
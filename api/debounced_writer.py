@@ -0,0 +1,155 @@
+# Python
+import os
+import time
+import atexit
+from threading import Thread, Lock, Event, current_thread
+
+# GroundSeg modules
+from log import Log
+
+class DebouncedWriter:
+
+    # Seconds to wait for more changes before writing
+    _delay = 0.5
+
+    # Attempts at serializing while other threads edit the data
+    _retries = 5
+
+    # Every writer, flushed at exit
+    _writers = []
+    _writers_lock = Lock()
+
+    # serialize returns the file contents as a string, after_write runs once it is on disk
+    def __init__(self, path, serialize, name, backup=True, delay=None, after_write=None):
+        self.path = path
+        self.name = name
+        self._serialize = serialize
+        self._backup = backup
+        self._after_write = after_write
+        if delay is not None:
+            self._delay = delay
+
+        self._dirty = Event()
+        self._write_lock = Lock()
+        self._thread = None
+        self._stopped = False
+
+        with DebouncedWriter._writers_lock:
+            if len(DebouncedWriter._writers) < 1:
+                atexit.register(DebouncedWriter.flush_all)
+            DebouncedWriter._writers.append(self)
+
+    # Ask for a write, returns immediately
+    def schedule(self):
+        if self._stopped:
+            return
+        self._dirty.set()
+        if self._thread is None:
+            with self._write_lock:
+                if self._thread is None and not self._stopped:
+                    self._thread = Thread(target=self._run, daemon=True)
+                    self._thread.start()
+
+    # Write now if anything is pending
+    def flush(self):
+        if self._dirty.is_set():
+            self._write()
+
+    # Drop pending changes and wait for the thread to exit, the file is going away
+    def cancel(self):
+        with self._write_lock:
+            self._stopped = True
+            self._dirty.clear()
+        with DebouncedWriter._writers_lock:
+            if self in DebouncedWriter._writers:
+                DebouncedWriter._writers.remove(self)
+
+        # wake the thread so it sees it was stopped
+        thread = self._thread
+        if thread is not None and thread is not current_thread():
+            self._dirty.set()
+            thread.join()
+
+    # Point .bak at the current file, so data just removed doesn't linger in the backup
+    def refresh_backup(self):
+        with self._write_lock:
+            if not self._backup or not os.path.exists(self.path):
+                return
+            bak_tmp = f"{self.path}.bak.tmp"
+            try:
+                os.remove(bak_tmp)
+            except FileNotFoundError:
+                pass
+            os.link(self.path, bak_tmp)
+            os.replace(bak_tmp, f"{self.path}.bak")
+
+    def flush_all():
+        for w in list(DebouncedWriter._writers):
+            try:
+                w.flush()
+            except Exception as e:
+                Log.log(f"{w.name}: Failed to flush: {e}")
+
+    def _run(self):
+        while True:
+            self._dirty.wait()
+            if self._stopped:
+                return
+            # let a burst of changes settle into one write
+            time.sleep(self._delay)
+            try:
+                self._write()
+            except Exception as e:
+                Log.log(f"{self.name}: Failed to save: {e}")
+                time.sleep(self._delay)
+
+    def _write(self):
+        with self._write_lock:
+            if self._stopped or not self._dirty.is_set():
+                return
+            self._dirty.clear()
+            try:
+                data = self._dump()
+                DebouncedWriter.write_atomic(self.path, data, self._backup)
+            except Exception:
+                self._dirty.set()
+                raise
+            Log.log(f"{self.name}: Saved {os.path.basename(self.path)}")
+            if self._after_write is not None:
+                self._after_write()
+
+    # Other threads may edit the dict while it is being dumped
+    def _dump(self):
+        for i in range(self._retries):
+            try:
+                return self._serialize()
+            except RuntimeError:
+                if i == self._retries - 1:
+                    raise
+                time.sleep(0.01)
+
+    # Write to a temp file, fsync, keep the previous file as .bak, then rename over
+    def write_atomic(path, data, backup=True):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if backup and os.path.exists(path):
+            bak_tmp = f"{path}.bak.tmp"
+            try:
+                os.remove(bak_tmp)
+            except FileNotFoundError:
+                pass
+            os.link(path, bak_tmp)
+            os.replace(bak_tmp, f"{path}.bak")
+
+        os.replace(tmp, path)
+
+        # make the rename itself durable
+        fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
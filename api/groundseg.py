@@ -4,9 +4,15 @@ try:
 except:
     dev = False
 
+# Python
+import os
+import signal
+
 # GroundSeg modules
+from log import Log
 from ws_util import WSUtil
 from config import Config
+from debounced_writer import DebouncedWriter
 from orchestrator import Orchestrator
 
 # Flask apps
@@ -28,6 +34,15 @@ from keygen import KeyGen
 # Setup System Config
 base_path = "/opt/nativeplanet/groundseg"
 sys_config = Config(base_path, dev)
+
+# Write pending config before systemd stops us
+def on_sigterm(signum, frame):
+    DebouncedWriter.flush_all()
+    Log.flush()
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
+
+signal.signal(signal.SIGTERM, on_sigterm)
 ws_util = WSUtil()
 
 # Start Updater
@@ -28,7 +28,7 @@ class GroundSeg:
             if approved:
                 endpoint = self.config['endpointUrl']
                 api_version = self.config['apiVersion']
-                url = f"https://{endpoint}/{api_version}"
+                url = f"{self.config['endpointScheme']}://{endpoint}/{api_version}"
                 if self.orchestrator.wireguard.get_regions(url):
                     return jsonify(200)
                 return jsonify(400)
@@ -74,6 +74,18 @@ class GroundSeg:
             return message
 
 
+        # Download a pier or bucket as it is compressed
+        @self.app.route('/urbit/export', methods=['GET'])
+        def urbit_export():
+            approved, message = self.verify(request)
+
+            if approved:
+                urbit_id = request.args.get('urbit_id')
+                res = self.orchestrator.handle_export(urbit_id, request)
+                return self.custom_jsonify(res)
+
+            return message
+
         # Handle device's system settings
         @self.app.route("/system", methods=['GET','POST'])
         def system_settings():
@@ -122,10 +134,36 @@ class GroundSeg:
 
             if approved:
                 res = self.orchestrator.handle_upload(request)
+                # (message, status) asks dropzone to retry the chunk
+                if type(res) is tuple:
+                    return jsonify(res[0]), res[1]
                 return jsonify(res)
 
             return message
         
+        # Resumable pier upload, start or resume from a manifest of chunk hashes
+        @self.app.route("/upload/manifest", methods=['POST'])
+        def pier_upload_manifest():
+            approved, message = self.verify(request)
+
+            if approved:
+                blob = request.get_json()
+                res = self.orchestrator.upload_manifest(blob)
+                return jsonify(res)
+
+            return message
+
+        # Resumable pier upload, one chunk by index
+        @self.app.route("/upload/chunk", methods=['PUT'])
+        def pier_upload_chunk():
+            approved, message = self.verify(request)
+
+            if approved:
+                res = self.orchestrator.upload_chunk(request)
+                return jsonify(res)
+
+            return message
+
         # Pier upload status
         @self.app.route("/upload/progress", methods=['POST'])
         def pier_upload_status():
@@ -184,7 +222,7 @@ class GroundSeg:
             sessionid = req.cookies.get('sessionid')
 
         # Verified session
-        if sessionid in self.config['sessions']:
+        if self.config_object.sessions.check(sessionid):
             return (True, None)
 
         # No session ID provided
@@ -0,0 +1,99 @@
+# Python
+import math
+from time import monotonic
+from threading import Lock
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Modules
+import requests
+from requests.adapters import HTTPAdapter
+
+# GroundSeg modules
+from log import Log
+
+class HealthProber:
+
+    # (connect, read) seconds per probe
+    _timeout = (3, 5)
+
+    # Probes in flight at once
+    _workers = 8
+
+    # Results kept per pier
+    _history = 30
+
+    # Restart when a pier answers 502 this many times within the window (seconds)
+    _threshold = 2
+    _window = 150
+
+    # Checks /~_~/healthz on every remote pier at once
+    def __init__(self):
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self._workers, pool_maxsize=self._workers, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=self._workers)
+        self._lock = Lock()
+
+        # patp -> deque of (when, status code or None, seconds)
+        self.results = {}
+
+    # Probe every pier in targets (patp -> wg_url), returns patp -> status code or None
+    def probe_all(self, targets):
+        futures = {self._pool.submit(self._probe, p, url): p for p, url in targets.items()}
+        # probes run _workers at a time and can't outlast their timeouts by much
+        rounds = math.ceil(len(futures) / self._workers)
+        done, _ = wait(futures, timeout=rounds * sum(self._timeout) + 5)
+
+        statuses = {}
+        for f, p in futures.items():
+            if f in done:
+                statuses[p] = f.result()
+            else:
+                # still queued, don't let it land after the prune
+                f.cancel()
+                statuses[p] = None
+
+        # drop piers that aren't remote anymore
+        with self._lock:
+            for p in list(self.results):
+                if p not in targets:
+                    self.results.pop(p)
+        return statuses
+
+    # True if a pier's anchor connection looks broken
+    def failing(self, patp):
+        since = monotonic() - self._window
+        with self._lock:
+            hist = self.results.get(patp, ())
+            count = sum(1 for when, status, _ in hist if when >= since and status == 502)
+        return count >= self._threshold
+
+    # Average seconds of the recent successful probes, None if there are none
+    def latency(self, patp):
+        with self._lock:
+            times = [t for _, status, t in self.results.get(patp, ()) if status == 200]
+        if len(times) < 1:
+            return None
+        return sum(times) / len(times)
+
+    # Forget the history, after a restart
+    def reset(self):
+        with self._lock:
+            self.results = {}
+
+    def _probe(self, patp, url):
+        start = monotonic()
+        status = None
+        try:
+            res = self._session.get(f"https://{url}/~_~/healthz", timeout=self._timeout)
+            status = res.status_code
+        except Exception as e:
+            Log.log(f"WG Refresher: {patp} health check failed: {e}")
+        took = monotonic() - start
+
+        with self._lock:
+            if patp not in self.results:
+                self.results[patp] = deque(maxlen=self._history)
+            self.results[patp].append((start, status, took))
+        return status
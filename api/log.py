@@ -1,40 +1,157 @@
 import os
 import sys
+import queue
+import atexit
 import shutil
+from array import array
+from threading import Thread, Lock
 from datetime import datetime
 
 class Log:
 
+    # Log directory
+    _base_path = "/opt/nativeplanet/groundseg"
+    _log_dir = f"{_base_path}/logs"
+
+    # Pending lines
+    _queue = queue.Queue()
+
+    # Max lines written per batch
+    _batch_size = 1000
+
+    # Writer state
+    _writer = None
+    _writer_lock = Lock()
+    _file = None
+    _month = None
+
+    # Reader state (byte offset of every complete line)
+    _index_lock = Lock()
+    _index = {"file": None, "offsets": array('Q'), "end": 0}
+
     # Log to file
     def log(text):
-        print(text, file=sys.stderr)
+        Log._queue.put((datetime.now(), text))
+        if Log._writer is None:
+            Log._start_writer()
+
+    # Get current logfile name
+    def logfile(now=None):
+        if now is None:
+            now = datetime.now()
+        return f"{Log._log_dir}/{now.strftime('%Y-%m')}.log"
+
+    # Write everything still in the queue
+    def flush():
+        lines = Log._drain()
+        if len(lines) > 0:
+            Log._write(lines)
+
+    # Start background writer
+    def _start_writer():
+        with Log._writer_lock:
+            if Log._writer is None:
+                Log._writer = Thread(target=Log._writer_loop, daemon=True)
+                Log._writer.start()
+                atexit.register(Log.flush)
+
+    # Block until lines are available, then write them in batches
+    def _writer_loop():
+        while True:
+            try:
+                lines = [Log._queue.get()]
+                lines = lines + Log._drain()
+                Log._write(lines)
+            except Exception as e:
+                print(f"Log: Writer failed: {e}", file=sys.stderr)
+
+    # Pull pending lines from the queue without blocking
+    def _drain():
+        lines = []
         try:
-            # make directory if doesn't exist
-            os.makedirs("/opt/nativeplanet/groundseg/logs", exist_ok=True)
-
-            # current log file
-            current_logfile = f"{datetime.now().strftime('%Y-%m')}.log"
-
-            # move legacy logfile to new directory
-            if os.path.isfile("/opt/nativeplanet/groundseg/groundseg.log"):
-                shutil.move("/opt/nativeplanet/groundseg/groundseg.log",
-                            f"/opt/nativeplanet/groundseg/logs/{current_logfile}")
-
-            # write to logfile
-            with open(f"/opt/nativeplanet/groundseg/logs/{current_logfile}", "a") as log:
-                log.write(f"{datetime.now()} {text}\n")
-                log.close()
-        except:
+            while len(lines) < Log._batch_size:
+                lines.append(Log._queue.get_nowait())
+        except queue.Empty:
             pass
+        return lines
+
+    def _write(lines):
+        with Log._writer_lock:
+            print("\n".join([text for _, text in lines]), file=sys.stderr)
+            try:
+                for stamp, text in lines:
+                    # rotate once per month
+                    if (stamp.year, stamp.month) != Log._month:
+                        Log._open(stamp)
+                    Log._file.write(f"{stamp} {text}\n")
+
+                Log._file.flush()
+            except Exception:
+                Log._file = None
+                Log._month = None
+
+    # Close previous logfile and open the new one
+    def _open(stamp):
+        if Log._file is not None:
+            try:
+                Log._file.close()
+            except Exception:
+                pass
+            Log._file = None
+            Log._month = None
+
+        name = Log.logfile(stamp)
+
+        # make directory if doesn't exist
+        os.makedirs(Log._log_dir, exist_ok=True)
+
+        # move legacy logfile to new directory
+        legacy = f"{Log._base_path}/groundseg.log"
+        if os.path.isfile(legacy):
+            shutil.move(legacy, name)
+
+        Log._file = open(name, "a")
+        Log._month = (stamp.year, stamp.month)
+
+    # Get GroundSeg logs from line onwards
+    def get_log(line=0):
+        with Log._index_lock:
+            idx = Log._index
+            name = Log.logfile()
+
+            # new month or truncated file, start a new index
+            try:
+                size = os.path.getsize(name)
+            except FileNotFoundError:
+                size = 0
+            if idx['file'] != name or size < idx['end']:
+                idx['file'] = name
+                idx['offsets'] = array('Q')
+                idx['end'] = 0
+
+            if size == 0:
+                return []
+
+            with open(name, 'rb') as f:
+                # index lines appended since the last read
+                if size > idx['end']:
+                    f.seek(idx['end'])
+                    pos = idx['end']
+                    for ln in f:
+                        if not ln.endswith(b"\n"):
+                            break
+                        idx['offsets'].append(pos)
+                        pos += len(ln)
+                    idx['end'] = pos
 
-    # Get GroundSeg logs
-    def get_log():
-        # current log file
-        current_logfile = f"{datetime.now().strftime('%Y-%m')}.log"
+                # seek straight to the requested line
+                if line < 0:
+                    line = max(len(idx['offsets']) + line, 0)
+                if line >= len(idx['offsets']):
+                    return []
 
-        # read log
-        with open(f"/opt/nativeplanet/groundseg/logs/{current_logfile}") as f:
-            log = f.read()
-            f.close()
+                start = idx['offsets'][line]
+                f.seek(start)
+                blob = f.read(idx['end'] - start)
 
-        return log.split("\n")
+        return blob.decode('utf-8', errors='replace').split("\n")[:-1]
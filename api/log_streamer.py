@@ -0,0 +1,164 @@
+# Python
+import time
+import calendar
+from itertools import islice
+from collections import deque
+from threading import Thread, Lock, RLock
+
+# GroundSeg modules
+from log import Log
+from container_cache import ContainerCache
+
+class LogStreamer:
+
+    # Lines kept per container
+    _max_lines = 5000
+
+    # Stop following a container nobody has asked about in this many seconds
+    _idle_timeout = 600
+
+    def __init__(self):
+        self._streams = {}
+        self._lock = Lock()
+
+    # Lines after the client's cursor
+    def get_lines(self, name, line):
+        s = self._get_stream(name)
+        self._follow(name, s)
+        with s['lock']:
+            s['polled'] = time.time()
+            if line >= s['total']:
+                return []
+            first = s['total'] - len(s['lines'])
+            return list(islice(s['lines'], max(line - first, 0), None))
+
+    # Call back with every new line of a container
+    def subscribe(self, name, callback):
+        s = self._get_stream(name)
+        with s['lock']:
+            s['subscribers'].add(callback)
+            lines = list(s['lines'])
+            total = s['total']
+        self._follow(name, s)
+        return lines, total
+
+    def unsubscribe(self, name, callback):
+        s = self._get_stream(name)
+        with s['lock']:
+            s['subscribers'].discard(callback)
+
+    def _get_stream(self, name):
+        with self._lock:
+            if name not in self._streams:
+                self._streams[name] = {
+                        "lock": RLock(),
+                        "lines": deque(maxlen=self._max_lines),
+                        "total": 0,           # lines seen since GroundSeg started
+                        "since": None,        # timestamp of the newest line
+                        "at_since": [],       # lines stamped exactly since
+                        "overlap": [],        # of those, the ones a restarted stream will send again
+                        "thread": None,
+                        "subscribers": set(),
+                        "polled": time.time()
+                        }
+            return self._streams[name]
+
+    # Make sure a thread is following the container
+    def _follow(self, name, s):
+        with s['lock']:
+            if s['thread'] is not None and s['thread'].is_alive():
+                return
+            c = ContainerCache.get(name)
+            if not c:
+                Log.log(f"Logs: {name} not found")
+                return
+
+            # fill the buffer before the first reply
+            if s['since'] is None:
+                try:
+                    self._add(name, s, c.logs(timestamps=True, tail=self._max_lines).split(b"\n"))
+                except Exception as e:
+                    Log.log(f"Logs: Failed to get {name} logs: {e}")
+                    return
+
+            s['thread'] = Thread(target=self._stream_loop, args=(name, s, c), daemon=True)
+            s['thread'].start()
+
+    def _stream_loop(self, name, s, c):
+        try:
+            since = None
+            with s['lock']:
+                if s['since'] is not None:
+                    since = s['since'][0] + (s['since'][1] / 1e9)
+                s['overlap'] = list(s['at_since'])
+            stream = c.logs(stream=True, follow=True, timestamps=True, since=since)
+            partial = b""
+            for chunk in stream:
+                lines = (partial + chunk).split(b"\n")
+                partial = lines.pop()
+                if len(lines) > 0:
+                    self._add(name, s, lines)
+
+                with s['lock']:
+                    idle = time.time() - s['polled'] > self._idle_timeout
+                    if idle and len(s['subscribers']) < 1:
+                        stream.close()
+                        break
+
+        except Exception as e:
+            Log.log(f"Logs: {name} log stream stopped: {e}")
+
+    # Store timestamped lines, skipping any a restarted stream sends again.
+    # Lines sharing a timestamp are all kept, only the ones at the old boundary are matched up.
+    def _add(self, name, s, raw):
+        new = []
+        with s['lock']:
+            for ln in raw:
+                if len(ln) < 1:
+                    continue
+                stamp, text = self._split(ln)
+                if stamp is not None and s['since'] is not None:
+                    if stamp < s['since']:
+                        continue
+                    if stamp == s['since']:
+                        if len(s['overlap']) > 0 and s['overlap'][0] == text:
+                            s['overlap'].pop(0)
+                            continue
+                        s['at_since'].append(text)
+                    else:
+                        s['since'] = stamp
+                        s['at_since'] = [text]
+                        s['overlap'] = []
+                elif stamp is not None:
+                    s['since'] = stamp
+                    s['at_since'] = [text]
+                new.append(text)
+
+            s['lines'].extend(new)
+            s['total'] += len(new)
+            total = s['total']
+            subscribers = list(s['subscribers'])
+
+        if len(new) < 1:
+            return
+
+        for callback in subscribers:
+            try:
+                callback(name, new, total)
+            except Exception as e:
+                Log.log(f"Logs: {name} subscriber failed: {e}")
+
+    # b"2023-05-01T12:34:56.123456789Z text" -> ((secs, nanos), "text")
+    def _split(self, ln):
+        ln = ln.decode("utf-8", errors="replace").rstrip("\r")
+        try:
+            ts, text = ln.split(" ", 1)
+        except ValueError:
+            ts, text = ln, ""
+        try:
+            secs = calendar.timegm(time.strptime(ts[:19], "%Y-%m-%dT%H:%M:%S"))
+            frac = ts[19:].rstrip("Z").lstrip(".")
+            nanos = int(frac.ljust(9, "0")[:9]) if frac else 0
+            return (secs, nanos), text
+        except Exception:
+            return None, ln
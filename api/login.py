@@ -1,6 +1,4 @@
 #Python
-import string
-import secrets
 from datetime import datetime, timedelta
 
 # Modules
@@ -33,18 +31,12 @@ class Login:
         return False
 
     def make_cookie(config):
-        secret = ''.join(secrets.choice(
-            string.ascii_uppercase +
-            string.ascii_lowercase +
-            string.digits) for i in range(64))
-
-        config.config['sessions'].append(secret)
-        config.save_config()
+        secret = config.sessions.create()
         Log.log("Login: Created new Session ID")
 
         res = make_response(jsonify(200))
         res.set_cookie('sessionid', secret)
-        Log.log(f"Login: Active Sessions {len(config.config['sessions'])}")
+        Log.log(f"Login: Active Sessions {config.sessions.count()}")
 
         return res
 
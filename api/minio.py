@@ -1,15 +1,11 @@
 # Python
-import os
 import json
-import zipfile
-from io import BytesIO
 from time import sleep
-
-# Flask
-from flask import send_file
+from threading import RLock
 
 # GroundSeg modules
 from log import Log
+from archive_streamer import ArchiveStreamer
 from mc_docker import MCDocker
 from minio_docker import MinIODocker
 
@@ -27,6 +23,9 @@ class MinIO:
 
     _volume_directory = '/var/lib/docker/volumes'
 
+    # mc rewrites its config.json without locking, one command at a time
+    _mc_lock = RLock()
+
     def __init__(self, config, wg):
         self.config_object = config
         self.config = config.config
@@ -100,27 +99,19 @@ class MinIO:
     def delete(self, name):
         return self.minio_docker.delete(name)
 
-    def export(self, patp):
+    # Stream the bucket as it is compressed, rng and if_range allow resuming a tar
+    def export(self, patp, fmt='zip', level=None, rng=None, if_range=None):
         name = f"minio_{patp}"
         Log.log(f"{name}: Attempting to export bucket")
         c = self.minio_docker.get_container(name)
         if c:
-            file_name = f"bucket_{patp}.zip"
-            memory_file = BytesIO()
-            file_path=f"{self._volume_directory}/{name}/_data/bucket"
-
             Log.log(f"{name}: Compressing bucket")
+            archive = ArchiveStreamer(f"bucket_{patp}", f"{self._volume_directory}/{name}/_data",
+                                      "bucket", fmt, level)
+            return archive.response(rng, if_range)
 
-            with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(file_path):
-                    arc_dir = root[root.find("_data/")+6:]
-                    for file in files:
-                        zipf.write(os.path.join(root, file), arcname=os.path.join(arc_dir,file))
-
-            memory_file.seek(0)
-
-            Log.log(f"{patp}: Pier successfully exported")
-            return send_file(memory_file, download_name=file_name, as_attachment=True)
+        Log.log(f"{name}: Export failed: container not found")
+        return 400
 
     def mc_setup(self, name, pier_config):
         Log.log(f"{name}: Attempting to create MinIO admin account")
@@ -128,8 +119,9 @@ class MinIO:
             patp = pier_config['pier_name']
             port = pier_config['wg_s3_port']
             pwd = pier_config['minio_password']
-            self.mc_docker.exec(self.mc_data['mc_name'], f"mc alias set patp_{patp} http://localhost:{port} {patp} {pwd}")
-            self.mc_docker.exec(self.mc_data['mc_name'], f"mc anonymous set public patp_{patp}/bucket")
+            with self._mc_lock:
+                self.mc_docker.exec(self.mc_data['mc_name'], f"mc alias set patp_{patp} http://localhost:{port} {patp} {pwd}")
+                self.mc_docker.exec(self.mc_data['mc_name'], f"mc anonymous set public patp_{patp}/bucket")
             Log.log(f"{name}: Created MinIO admin account")
             return True
 
@@ -144,24 +136,25 @@ class MinIO:
 
         Log.log(f"{name}: Attempting to make service account")
         try:
-            # create admin account if failed previously
-            if self.mc_setup(name, pier_config):
-                c = self.mc_docker.get_container(self.mc_data['mc_name'])
-                if c:
-                    Log.log(f"{name}: Attempting to update service account credentials.")
-                    command = f"mc admin user svcacct edit --secret-key '{pwd}' patp_{patp} {acc}"
-                    x = c.exec_run(command, tty=True).output.decode('utf-8').strip()
-
-                    if 'ERROR' in x:
-                        Log.log(f"{name}: Service account does not exist. Creating new account")
-                        command = f"mc admin user svcacct add --access-key '{acc}' --secret-key '{pwd}' patp_{patp} {patp}"
-                        x = c.exec_run(command).output.decode('utf-8').strip()
+            with self._mc_lock:
+                # create admin account if failed previously
+                if self.mc_setup(name, pier_config):
+                    c = self.mc_docker.get_container(self.mc_data['mc_name'])
+                    if c:
+                        Log.log(f"{name}: Attempting to update service account credentials.")
+                        command = f"mc admin user svcacct edit --secret-key '{pwd}' patp_{patp} {acc}"
+                        x = c.exec_run(command, tty=True).output.decode('utf-8').strip()
 
                         if 'ERROR' in x:
-                            raise Exception(x)
+                            Log.log(f"{name}: Service account does not exist. Creating new account")
+                            command = f"mc admin user svcacct add --access-key '{acc}' --secret-key '{pwd}' patp_{patp} {patp}"
+                            x = c.exec_run(command).output.decode('utf-8').strip()
+
+                            if 'ERROR' in x:
+                                raise Exception(x)
 
-                    Log.log(f"{name}: Service account created")
-                    return True
+                        Log.log(f"{name}: Service account created")
+                        return True
 
         except Exception as e:
             Log.log(f"{name}: Failed to update service account credentials: {e}")
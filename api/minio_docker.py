@@ -1,5 +1,7 @@
 import docker
 from log import Log
+from utils import Utils
+from container_cache import ContainerCache
 
 client = docker.from_env()
 
@@ -14,7 +16,7 @@ class MinIODocker:
 
         Log.log(f"{name}: Attempting to start container")
         # Remove container
-        c = self.get_container(name)
+        c = self.get_container(name, live=True)
         if c:
             self.remove_container(name)
 
@@ -37,6 +39,7 @@ class MinIODocker:
 
         try:
             c.start()
+            ContainerCache.refresh(name)
             Log.log(f"{name}: Successfully started container")
             return self.exec(name, 'mkdir -p /data/bucket')
         except:
@@ -49,6 +52,7 @@ class MinIODocker:
         if c:
             try:
                 c.stop()
+                ContainerCache.refresh(name)
             except Exception:
                 Log.log(f"{name}: Failed to stop container")
                 return False
@@ -96,6 +100,7 @@ class MinIODocker:
                 if m.name != 'minio_client' and m.name.startswith('minio_'):
                     try:
                         m.start()
+                        ContainerCache.refresh(m.name)
                         Log.log(f"MinIO: Started {m.name}")
                     except Exception: 
                         Log.log(f"MinIO: Failed to start {m.name}")
@@ -115,6 +120,7 @@ class MinIODocker:
                 if m.name != 'minio_client' and m.name.startswith('minio_'):
                     try:
                         m.stop()
+                        ContainerCache.refresh(m.name)
                         Log.log(f"MinIO: Stopped {m.name}")
                     except Exception: 
                         Log.log(f"MinIO: Failed to stop {m.name}")
@@ -125,14 +131,11 @@ class MinIODocker:
 
         return True
 
-    def get_container(self, name, show_error=True):
-        try:
-            c = client.containers.get(name)
-            return c
-        except:
-            if show_error:
-                Log.log(f"{name}: Container not found")
-        return False
+    def get_container(self, name, show_error=True, live=False):
+        c = ContainerCache.get(name, live)
+        if not c and show_error:
+            Log.log(f"{name}: Container not found")
+        return c
 
     def create_container(self, name, image, config):
         Log.log(f"{name}: Attempting to create container")
@@ -151,10 +154,15 @@ class MinIODocker:
             return False
         else:
             c.remove(force=True)
+            ContainerCache.refresh(name)
             Log.log(f"{name}: Successfully removed container")
             return True
 
+    # MinIOs starting together share one pull of the same image
     def pull_image(self, name, image):
+        return Utils.single_flight(f"pull:{image}", lambda: self._pull(name, image))
+
+    def _pull(self, name, image):
         try:
             Log.log(f"{name}: Pulling {image}")
             client.images.pull(image)
@@ -207,6 +215,7 @@ class MinIODocker:
                     network = 'container:wireguard',
                     mounts = [mount],
                     detach=True)
+            ContainerCache.refresh(name)
             return c
 
         except Exception as e:
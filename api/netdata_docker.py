@@ -1,5 +1,6 @@
 import docker
 from log import Log
+from container_cache import ContainerCache
 
 client = docker.from_env()
 class NetdataDocker:
@@ -13,7 +14,7 @@ class NetdataDocker:
             image = f"{image}@sha256:{config[sha]}"
 
         Log.log("Netdata: Attempting to start container")
-        c = self.get_container(name)
+        c = self.get_container(name, live=True)
         if not c:
             c = self.create_container(name, image, config)
             if not c:
@@ -32,19 +33,18 @@ class NetdataDocker:
 
         try:
             c.start()
+            ContainerCache.refresh(name)
             Log.log("Netdata: Successfully started container")
             return True
         except:
             Log.log("Netdata: Failed to start container")
             return False
 
-    def get_container(self, name):
-        try:
-            c = client.containers.get(name)
-            return c
-        except:
+    def get_container(self, name, live=False):
+        c = ContainerCache.get(name, live)
+        if not c:
             Log.log("Netdata: Container not found")
-            return False
+        return c
 
     def create_container(self, name, image, config):
         Log.log("Netdata: Attempting to create container")
@@ -59,6 +59,7 @@ class NetdataDocker:
             return False
         else:
             c.remove(force=True)
+            ContainerCache.refresh(name)
             Log.log("Netdata: Successfully removed container")
             return True
 
@@ -88,6 +89,7 @@ class NetdataDocker:
                     restart_policy = {"always": config['restart']},
                     security_opt = [config['security_opt']],
                     detach=True)
+            ContainerCache.refresh(name)
             return c
 
         except Exception as e:
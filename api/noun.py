@@ -0,0 +1,99 @@
+class Noun:
+
+    # Atoms are ints, cells are (head, tail) tuples
+
+    # Cord from a str
+    def cord(text):
+        return int.from_bytes(text.encode('utf-8'), 'little')
+
+    # str from a cord
+    def text(atom):
+        return atom.to_bytes((atom.bit_length() + 7) // 8, 'little').decode('utf-8', errors='replace')
+
+    # Right nested cell from items, [a b c] is (a, (b, c))
+    def cell(*items):
+        noun = items[-1]
+        for i in reversed(items[:-1]):
+            noun = (i, noun)
+        return noun
+
+    # Serialize without backreferences, cue doesn't need them
+    def jam(noun):
+        out = 0
+        pos = 0
+        stack = [noun]
+        while len(stack) > 0:
+            n = stack.pop()
+            if type(n) is tuple:
+                # cell tag 01
+                out |= 1 << pos
+                pos += 2
+                stack.append(n[1])
+                stack.append(n[0])
+            else:
+                # atom tag 0
+                pos += 1
+                bits, length = Noun._mat(n)
+                out |= bits << pos
+                pos += length
+        return out
+
+    def cue(atom):
+        cache = {}
+        pos = 0
+        # frames of [start, head] waiting for their tail
+        frames = []
+        result = None
+        while True:
+            start = pos
+            if (atom >> pos) & 1 == 0:
+                length, value = Noun._rub(atom, pos + 1)
+                pos += 1 + length
+                noun = value
+                cache[start] = noun
+            elif (atom >> (pos + 1)) & 1 == 0:
+                pos += 2
+                frames.append([start, None])
+                continue
+            else:
+                length, ref = Noun._rub(atom, pos + 2)
+                pos += 2 + length
+                noun = cache[ref]
+
+            # finish cells whose tail just completed
+            while True:
+                if len(frames) < 1:
+                    result = noun
+                    break
+                frame = frames[-1]
+                if frame[1] is None:
+                    frame[1] = (noun,)
+                    break
+                frames.pop()
+                noun = (frame[1][0], noun)
+                cache[frame[0]] = noun
+
+            if result is not None:
+                return result
+
+    # Length prefixed atom
+    def _mat(a):
+        if a == 0:
+            return 1, 1
+        b = a.bit_length()
+        c = b.bit_length()
+        bits = (1 << c) | ((b & ((1 << (c - 1)) - 1)) << (c + 1)) | (a << (2 * c))
+        return bits, 2 * c + b
+
+    def _rub(atom, pos):
+        c = 0
+        while (atom >> (pos + c)) & 1 == 0:
+            c += 1
+            if c > 64:
+                raise ValueError("bad noun encoding")
+        if c == 0:
+            return 1, 0
+
+        b = ((atom >> (pos + c + 1)) & ((1 << (c - 1)) - 1)) | (1 << (c - 1))
+        value = (atom >> (pos + 2 * c)) & ((1 << b) - 1)
+        return 2 * c + b, value
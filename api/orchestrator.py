@@ -1,7 +1,6 @@
 # Python 
 import os
 import time
-import socket
 import subprocess
 from time import sleep
 from datetime import datetime
@@ -18,6 +17,9 @@ from system_get import SysGet
 from system_post import SysPost
 from bug_report import BugReport
 from utils import Utils
+from log_streamer import LogStreamer
+from upload_pipe import UploadPipe
+from upload_sessions import UploadSessions
 
 # Websocket
 from ws_system import WSSystem
@@ -55,8 +57,16 @@ class Orchestrator:
         self.wireguard = Wireguard(config)
         self.netdata = Netdata(config)
         self.minio = MinIO(config, self.wireguard)
-        self.urbit = Urbit(config, self.wireguard, self.minio)
+        self.urbit = Urbit(config, self.wireguard, self.minio, ws_util)
         self.webui = WebUI(config)
+        self.log_streamer = LogStreamer()
+
+        # patp -> UploadPipe for tarballs extracted as they upload
+        self.upload_pipes = {}
+
+        # Open files for chunked uploads
+        self.upload_sessions = UploadSessions()
+        Thread(target=self.upload_expiry_loop, daemon=True).start()
 
         # TODO: temp
         self.ws_init(config, debug)
@@ -71,6 +81,7 @@ class Orchestrator:
     # Duplicate of __init__ for future use
     def ws_init(self, config, debug):
         self.ws_system = WSSystem(self.config_object, self.ws_util)
+        self.wireguard.anchor.subscribe(self.ws_system.anchor_changed, ['region', 'lease', 'ongoing'])
         self.ws_urbits = WSUrbits(self.config_object, self.urbit, self.ws_util)
         self.ws_minios = WSMinIOs(self.minio, self.ws_util)
 
@@ -412,14 +423,14 @@ class Orchestrator:
                 "updateMode": self.config['updateMode'],
                 "minio": self.minio.minios_on,
                 "containers" : SysGet.get_containers(),
-                "sessions": len(self.config['sessions']),
+                "sessions": self.config_object.sessions.count(),
                 "gsVersion": ver,
                 "uiBranch": ui_branch,
                 "ram": self.config_object._ram,
                 "cpu": self.config_object._cpu,
                 "temp": self.config_object._core_temp,
                 "disk": self.config_object._disk,
-                "netdata": f"http://{socket.gethostname()}.local:{self.netdata.data['port']}",
+                "netdata": f"http://{Utils.get_hostname()}.local:{self.netdata.data['port']}",
                 "swapVal": self.config['swapVal'],
                 "maxSwap": Utils.max_swap(self.config['swapFile'], self.config['swapVal'])
                 }
@@ -507,7 +518,7 @@ class Orchestrator:
                 if data['action'] == 'register':
                     endpoint = self.config['endpointUrl']
                     api_version = self.config['apiVersion']
-                    url = f"https://{endpoint}/{api_version}"
+                    url = f"{self.config['endpointScheme']}://{endpoint}/{api_version}"
 
                     if self.wireguard.build_anchor(url, data['key'], data['region']):
                         self.minio.start_mc()
@@ -526,7 +537,7 @@ class Orchestrator:
             if data['action'] == 'unsubscribe':
                 endpoint = self.config['endpointUrl']
                 api_version = self.config['apiVersion']
-                url = f'https://{endpoint}/{api_version}'
+                url = f"{self.config['endpointScheme']}://{endpoint}/{api_version}"
                 return self.wireguard.cancel_subscription(data['key'],url)
 
         # logs module
@@ -535,11 +546,34 @@ class Orchestrator:
                 return self.get_log_lines(data['container'], data['haveLine'])
 
             if data['action'] == 'export':
-                return '\n'.join(self.get_log_lines(data['container'], 0))
+                return '\n'.join(self.export_log_lines(data['container']))
 
         return module
 
+    # Containers the logs module is allowed to read
+    def log_container(self, container):
+        if container in ['wireguard', 'netdata']:
+            return True
+        if container.startswith('minio_'):
+            return True
+        return container in self.urbit._urbits
+
+    # New lines since the client's cursor
     def get_log_lines(self, container, line):
+        try:
+            if container == 'groundseg':
+                return Log.get_log(line)
+
+            if self.log_container(container):
+                return self.log_streamer.get_lines(container, line)
+
+        except Exception as e:
+            Log.log(f"Logs: Failed to get logs for {container}: {e}")
+
+        return []
+
+    # Complete logs for export
+    def export_log_lines(self, container):
         blob = ''
 
         try:
@@ -550,7 +584,7 @@ class Orchestrator:
                 blob = self.netdata.logs()
 
             if container == 'groundseg':
-                return Log.get_log()[line:]
+                return Log.get_log()
 
             if 'minio_' in container:
                 blob = self.minio.minio_logs(container)
@@ -558,7 +592,7 @@ class Orchestrator:
             if container in self.urbit._urbits:
                 blob = self.urbit.logs(container)
 
-            blob = blob.decode('utf-8').split('\n')[line:]
+            blob = blob.decode('utf-8').split('\n')
 
         except Exception:
             Log.log(f"Logs: Failed to get logs for {container}")
@@ -576,32 +610,211 @@ class Orchestrator:
             patp = data['patp']
             if data['action'] == 'status':
                 try:
-                    res = self.config_object.upload_status[patp]
-                    if res['status'] == 'extracting':
-                        res['progress']['current'] = self.get_directory_size(f"{self.config['dockerData']}/volumes/{patp}/_data")
-                        return res
-                    return res
+                    # progress counters are kept current by the upload and extractor
+                    return self.config_object.upload_status[patp]
                 except Exception as e:
                     Log.log(f"Upload: Failed to get status {e}")
                     return {'status':'none'}
 
             if data['action'] == 'remove':
-                self.config_object.upload_status.pop(patp)
+                self.urbit.clear_upload_status(patp)
                 return {'status':'removed'}
 
+            # chunks a resumable upload still needs
+            if data['action'] == 'chunks':
+                s = self.upload_sessions.get(patp)
+                if s is None or s['hashes'] is None:
+                    return {'status':'none'}
+                return {
+                        'status':'uploading',
+                        'missing': self.upload_sessions.missing(s),
+                        'progress': s['progress']
+                        }
+
         except Exception as e:
             Log.log(f"Upload: Failed to get upload status: {e}")
             return {'status':'none'}
 
-    def get_directory_size(self, directory):
-        total_size = 0
-        with os.scandir(directory) as it:
-            for entry in it:
-                if entry.is_file():
-                    total_size += entry.stat().st_size
-                elif entry.is_dir():
-                    total_size += self.get_directory_size(entry.path)
-        return total_size
+    # Streamed pier or bucket download
+    def handle_export(self, urbit_id, req):
+        try:
+            app = req.args.get('app', 'pier')
+            fmt = req.args.get('format', 'zip')
+            level = req.args.get('level')
+            if_range = req.headers.get('If-Range')
+
+            if app == 'pier':
+                return self.urbit.export(urbit_id, fmt, level, req.range, if_range)
+            if app == 'minio':
+                return self.minio.export(urbit_id, fmt, level, req.range, if_range)
+
+        except Exception as e:
+            Log.log(f"{urbit_id}: Export failed: {e}")
+
+        return 400
+
+    # Drop uploads the browser walked away from
+    def upload_expiry_loop(self):
+        while True:
+            sleep(60)
+            try:
+                self.expire_uploads()
+            except Exception as e:
+                Log.log(f"Upload: Failed to expire uploads: {e}")
+
+    def expire_uploads(self):
+        expired = self.upload_sessions.expire()
+        for patp in expired:
+            self.urbit.clear_upload_status(patp)
+
+        for patp, pipe in list(self.upload_pipes.items()):
+            if not pipe.expired() or self.upload_pipes.get(patp) is not pipe:
+                continue
+            Log.log(f"{patp}: Upload expired")
+            self.upload_pipes.pop(patp, None)
+            pipe.abort("Upload expired")
+            pipe.finish()
+            self.urbit.discard_extract(patp)
+            self.urbit.clear_upload_status(patp)
+            expired.append(patp)
+
+        if len(expired) > 0 and len(self.upload_pipes) < 1:
+            self.end_upload_mode()
+
+    # Start or resume an upload described by its chunk hashes
+    def upload_manifest(self, data):
+        try:
+            filename = secure_filename(data['filename'])
+            patp = filename.split('.')[0]
+            if not Utils.check_patp(patp):
+                return "File is invalid"
+
+            # change to temp mode (DO NOT SAVE CONFIG)
+            if self.config['updateMode'] == 'auto':
+                self.config['updateMode'] = 'temp'
+
+            self.expire_uploads()
+
+            file_subfolder = f"{self.config_object.base_path}/uploaded/{patp}"
+            os.makedirs(file_subfolder, exist_ok=True)
+
+            s = self.upload_sessions.start_manifest(patp, f"{file_subfolder}/{filename}", data)
+            s['filename'] = filename
+            self.urbit.set_upload_status(patp, 'uploading', s['progress'])
+            return {'patp': patp, 'missing': self.upload_sessions.missing(s)}
+
+        except Exception as e:
+            Log.log(f"Upload: Invalid manifest: {e}")
+
+        return 400
+
+    # One chunk of a manifest upload, boots the pier once every chunk is verified
+    def upload_chunk(self, req):
+        patp = req.args.get('patp')
+        s = self.upload_sessions.get(patp)
+        if s is None or s['hashes'] is None:
+            return "Upload not started, send the manifest first"
+
+        if self.config['updateMode'] == 'auto':
+            self.config['updateMode'] = 'temp'
+
+        try:
+            index = int(req.args.get('index'))
+            if not self.upload_sessions.write_verified(s, index, req.stream):
+                return "Chunk hash mismatched"
+        except Exception as e:
+            Log.log(f"{patp}: Error writing to disk: {e}")
+            return "Can't write to disk"
+
+        if not self.upload_sessions.complete(s):
+            return 200
+
+        try:
+            size = self.upload_sessions.finish(s)
+        except Exception as e:
+            Log.log(f"{patp}: Error writing to disk: {e}")
+            self.end_upload_mode()
+            return "Can't write to disk"
+
+        # Another request finished it
+        if size is None:
+            return 200
+
+        Log.log(f"{patp}: Upload complete")
+        res = self.urbit.boot_existing(s['filename'], s['remote'], s['fix'])
+        self.end_upload_mode()
+        return res
+
+    # Feed a tarball chunk to its extractor, boot the pier after the last one
+    def stream_upload(self, patp, req, file, remote, fix):
+        current_chunk = int(req.form['dzchunkindex'])
+        total_chunks = int(req.form['dztotalchunkcount'])
+        total_size = int(req.form['dztotalfilesize'])
+
+        if not Utils.check_patp(patp):
+            res = "File is invalid"
+        else:
+            res = 200
+            try:
+                # a retried first chunk carries on, anything else starts over
+                old = self.upload_pipes.get(patp)
+                if current_chunk == 0 and (old is None or old.next_chunk > 0 or old.error is not None):
+                    old = self.upload_pipes.pop(patp, None)
+                    if old is not None:
+                        Log.log(f"{patp}: Restarting upload")
+                        old.abort("Upload restarted")
+                        old.finish()
+                    Log.log(f"{patp}: Starting streamed upload")
+                    extractor = self.urbit.prepare_extract(patp)
+                    self.upload_pipes[patp] = UploadPipe(patp, extractor, total_size)
+                    self.urbit.set_upload_status(patp, 'uploading', extractor.progress)
+
+                offset = int(req.form['dzchunkbyteoffset'])
+                expected = min(int(req.form['dzchunksize']), total_size - offset)
+
+                pipe = self.upload_pipes.get(patp)
+                if pipe is None:
+                    res = "Upload not started, try uploading again"
+                elif not pipe.feed(current_chunk, file.stream, expected):
+                    self.upload_pipes.pop(patp, None)
+                    pipe.finish()
+                    res = "File extraction failed"
+
+                elif pipe.next_chunk <= current_chunk:
+                    # keep the pipe, the retry picks up where this one stopped
+                    return ("Chunk failed, retry", 500)
+
+                elif current_chunk + 1 == total_chunks:
+                    self.upload_pipes.pop(patp, None)
+                    self.urbit.set_upload_status(patp, 'extracting', pipe.extractor.progress)
+                    error = pipe.finish()
+                    if error is not None:
+                        res = "File extraction failed"
+                    elif pipe.received != total_size:
+                        Log.log(f"{patp}: File size mismatched")
+                        res = "File size mismatched"
+                    else:
+                        Log.log(f"{patp}: Upload complete")
+                        extracted = self.urbit.place_pier(patp, pipe.extractor)
+                        res = self.urbit.boot_extracted(patp, extracted, remote, fix)
+                else:
+                    # Not final chunk yet
+                    return 200
+
+            except Exception as e:
+                Log.log(f"{patp}: Streamed upload failed: {e}")
+                pipe = self.upload_pipes.pop(patp, None)
+                if pipe is not None:
+                    pipe.abort(str(e))
+                res = "Can't write to disk"
+
+        if res != 200:
+            self.urbit.clear_upload_status(patp)
+            if patp not in self.upload_pipes:
+                self.urbit.discard_extract(patp)
+
+        self.end_upload_mode()
+        return res
 
 
 
@@ -633,7 +846,13 @@ class Orchestrator:
         filename = secure_filename(file.filename)
         patp = filename.split('.')[0]
 
-        self.config_object.upload_status[patp] = {'status':'uploading'}
+        # Tarballs are read front to back, extract them as the chunks arrive
+        if filename.endswith("tar") or filename.endswith("tar.gz") or filename.endswith("tgz"):
+            return self.stream_upload(patp, req, file, remote, fix)
+
+        # Drop uploads that went quiet
+        for expired in self.upload_sessions.expire():
+            self.urbit.clear_upload_status(expired)
 
         # Create subfolder
         file_subfolder = f"{self.config_object.base_path}/uploaded/{patp}"
@@ -641,65 +860,57 @@ class Orchestrator:
 
         save_path = f"{file_subfolder}/{filename}"
         current_chunk = int(req.form['dzchunkindex'])
+        total_chunks = int(req.form['dztotalchunkcount'])
+        total_size = int(req.form['dztotalfilesize'])
+        uuid = req.form.get('dzuuid', filename)
 
-        if current_chunk == 0:
-            try:
-                Log.log(f"{patp}: Starting upload")
-                os.remove(save_path)
-                Log.log(f"{patp}: Cleaning up old files")
-            except:
-                Log.log(f"{patp}: Directory is clear")
-
-        if os.path.exists(save_path) and current_chunk == 0:
-            os.remove(save_path)
-
-            if self.config['updateMode'] == 'temp':
-                self.config['updateMode'] = 'auto'
-                self.config_object.save_config()
-
-            return "File exists, try uploading again"
+        offset = int(req.form['dzchunkbyteoffset'])
+        expected = min(int(req.form['dzchunksize']), total_size - offset)
 
         try:
-            with open(save_path, 'ab') as f:
-                f.seek(int(req.form['dzchunkbyteoffset']))
-                f.write(file.stream.read())
+            session = self.upload_sessions.start(patp, uuid, save_path, total_size, total_chunks)
         except Exception as e:
             Log.log(f"{patp}: Error writing to disk: {e}")
-
-            if self.config['updateMode'] == 'temp':
-                self.config['updateMode'] = 'auto'
-                self.config_object.save_config()
-
+            self.end_upload_mode()
             return "Can't write to disk"
 
-        total_chunks = int(req.form['dztotalchunkcount'])
+        # Keep the session, dropzone retries the chunk with the same uuid
+        try:
+            self.upload_sessions.write(session, current_chunk, offset, file.stream, expected)
+            self.urbit.set_upload_status(patp, 'uploading', session['progress'])
+        except Exception as e:
+            Log.log(f"{patp}: Failed to write chunk {current_chunk}: {e}")
+            return ("Chunk failed, retry", 500)
 
-        if current_chunk + 1 == total_chunks:
-            # This was the last chunk, the file should be complete and the size we expect
-            if os.path.getsize(save_path) != int(req.form['dztotalfilesize']):
-                Log.log(f"{patp}: File size mismatched")
+        # Not final chunk yet
+        if not self.upload_sessions.complete(session):
+            return 200
 
-                if self.config['updateMode'] == 'temp':
-                    self.config['updateMode'] = 'auto'
-                    self.config_object.save_config()
+        try:
+            size = self.upload_sessions.finish(session)
+        except Exception as e:
+            Log.log(f"{patp}: Error writing to disk: {e}")
+            self.end_upload_mode()
+            return "Can't write to disk"
 
-                # size mismatch
-                return "File size mismatched"
-            else:
-                Log.log(f"{patp}: Upload complete")
-                #TODO: move the entire endpoint to ws
-                res = self.urbit.boot_existing(filename, remote, fix)
-                if self.config['updateMode'] == 'temp':
-                    self.config['updateMode'] = 'auto'
-                    self.config_object.save_config()
-                return res
+        # Another request finished it
+        if size is None:
+            return 200
 
+        # The file should be complete and the size we expect
+        if size != total_size:
+            Log.log(f"{patp}: File size mismatched")
+            res = "File size mismatched"
         else:
-            # Not final chunk yet
-            return 200
+            Log.log(f"{patp}: Upload complete")
+            #TODO: move the entire endpoint to ws
+            res = self.urbit.boot_existing(filename, remote, fix)
+
+        self.end_upload_mode()
+        return res
 
+    # Back to auto updates once an upload is over
+    def end_upload_mode(self):
         if self.config['updateMode'] == 'temp':
             self.config['updateMode'] = 'auto'
             self.config_object.save_config()
-
-        return 400
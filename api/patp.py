@@ -0,0 +1,135 @@
+# GroundSeg modules
+from log import Log
+
+_pre = "dozmarbinwansamlitsighidfidlissogdirwacsabwissibrigsoldopmodfoglidhopdardorlorhodfolrintogsilmirholpaslacrovlivdalsatlibtabhanticpidtorbolfosdotlosdilforpilramtirwintadbicdifrocwidbisdasmidloprilnardapmolsanlocnovsitnidtipsicropwitnatpanminritpodmottamtolsavposnapnopsomfinfonbanmorworsipronnorbotwicsocwatdolmagpicdavbidbaltimtasmalligsivtagpadsaldivdactansidfabtarmonranniswolmispallasdismaprabtobrollatlonnodnavfignomnibpagsopralbilhaddocridmocpacravripfaltodtiltinhapmicfanpattaclabmogsimsonpinlomrictapfirhasbosbatpochactidhavsaplindibhosdabbitbarracparloddosbortochilmactomdigfilfasmithobharmighinradmashalraglagfadtopmophabnilnosmilfopfamdatnoldinhatnacrisfotribhocnimlarfitwalrapsarnalmoslandondanladdovrivbacpollaptalpitnambonrostonfodponsovnocsorlavmatmipfip"
+_suf = "zodnecbudwessevpersutletfulpensytdurwepserwylsunrypsyxdyrnuphebpeglupdepdysputlughecryttyvsydnexlunmeplutseppesdelsulpedtemledtulmetwenbynhexfebpyldulhetmevruttylwydtepbesdexsefwycburderneppurrysrebdennutsubpetrulsynregtydsupsemwynrecmegnetsecmulnymtevwebsummutnyxrextebfushepbenmuswyxsymselrucdecwexsyrwetdylmynmesdetbetbeltuxtugmyrpelsyptermebsetdutdegtexsurfeltudnuxruxrenwytnubmedlytdusnebrumtynseglyxpunresredfunrevrefmectedrusbexlebduxrynnumpyxrygryxfeptyrtustyclegnemfermertenlusnussyltecmexpubrymtucfyllepdebbermughuttunbylsudpemdevlurdefbusbeprunmelpexdytbyttyplevmylwedducfurfexnulluclennerlexrupnedlecrydlydfenwelnydhusrelrudneshesfetdesretdunlernyrsebhulrylludremlysfynwerrycsugnysnyllyndyndemluxfedsedbecmunlyrtesmudnytbyrsenwegfyrmurtelreptegpecnelnevfes"
+
+class Patp:
+
+    # Syllables by byte value, and byte value by syllable
+    prefixes = tuple(_pre[i:i+3] for i in range(0, len(_pre), 3))
+    suffixes = tuple(_suf[i:i+3] for i in range(0, len(_suf), 3))
+    _pre_index = {s: i for i, s in enumerate(prefixes)}
+    _suf_index = {s: i for i, s in enumerate(suffixes)}
+
+    # Murmur3 seeds for the planet scrambler, as in urbit-ob
+    _seeds = (0xb76d5eed, 0xee281300, 0x85bcae01, 0x4b387af7)
+
+    # Same rules as before: a galaxy, or dash separated words not starting with doz
+    def check(patp):
+        if type(patp) != str:
+            return False
+
+        start = 1 if patp.startswith("~") else 0
+        n = len(patp) - start
+
+        # Galaxy check
+        if n == 3:
+            return patp[start:] in Patp._suf_index
+
+        # words are 6 letters with a dash between each
+        if n < 6 or (n + 1) % 7 != 0:
+            return False
+        if patp.startswith("doz", start):
+            return False
+
+        pre = Patp._pre_index
+        suf = Patp._suf_index
+        for i in range(start, len(patp), 7):
+            if patp[i:i+3] not in pre or patp[i+3:i+6] not in suf:
+                return False
+            if i + 6 < len(patp) and patp[i+6] != '-':
+                return False
+        return True
+
+    # Ship name to its number, None if it isn't a ship name
+    def to_int(patp):
+        try:
+            name = patp[1:] if patp.startswith("~") else patp
+            if len(name) == 3:
+                return Patp._suf_index[name]
+
+            n = 0
+            for word in name.replace("--", "-").split("-"):
+                if len(word) != 6:
+                    return None
+                n = (n << 16) | (Patp._pre_index[word[:3]] << 8) | Patp._suf_index[word[3:]]
+            return Patp._fynd(n)
+        except Exception as e:
+            Log.log(f"Patp: Failed to decode {patp}: {e}")
+            return None
+
+    # Sort key, ships in numeric order with names that don't decode last
+    def sort_key(patp):
+        n = Patp.to_int(patp)
+        return (n is None, n or 0, patp)
+
+    # Unscramble planets and moons, @p to their number
+    def _fynd(cry):
+        if 0x10000 <= cry <= 0xffffffff:
+            return 0x10000 + Patp._tail(cry - 0x10000)
+        if 0x100000000 <= cry <= 0xffffffffffffffff:
+            return (cry & 0xffffffff00000000) | Patp._fynd(cry & 0xffffffff)
+        return cry
+
+    # Inverse of the Feistel cipher over 0xffff * 0x10000 with cycle walking
+    def _tail(m):
+        c = Patp._fen(4, 0xffff, 0x10000, m)
+        return c if c < 0xffffffff else Patp._fen(4, 0xffff, 0x10000, c)
+
+    def _fen(r, a, b, m):
+        ahh = m // a if r % 2 != 0 else m % a
+        ale = m % a if r % 2 != 0 else m // a
+        ell = ahh if ale == a else ale
+        arr = ale if ale == a else ahh
+
+        for j in range(r, 0, -1):
+            eff = Patp._f(j - 1, ell)
+            if j % 2 != 0:
+                tmp = (arr + a - (eff % a)) % a
+            else:
+                tmp = (arr + b - (eff % b)) % b
+            arr, ell = ell, tmp
+
+        return a * arr + ell
+
+    def _f(j, key):
+        return Patp._murmur3(bytes((key & 0xff, (key >> 8) & 0xff)), Patp._seeds[j])
+
+    # murmur3 x86 32 bit
+    def _murmur3(data, seed):
+        c1 = 0xcc9e2d51
+        c2 = 0x1b873593
+        h = seed
+        length = len(data)
+        tail = length & ~3
+
+        for i in range(0, tail, 4):
+            k = int.from_bytes(data[i:i+4], 'little')
+            k = (k * c1) & 0xffffffff
+            k = ((k << 15) | (k >> 17)) & 0xffffffff
+            k = (k * c2) & 0xffffffff
+            h ^= k
+            h = ((h << 13) | (h >> 19)) & 0xffffffff
+            h = (h * 5 + 0xe6546b64) & 0xffffffff
+
+        k = 0
+        rest = length & 3
+        if rest == 3:
+            k ^= data[tail + 2] << 16
+        if rest >= 2:
+            k ^= data[tail + 1] << 8
+        if rest >= 1:
+            k ^= data[tail]
+            k = (k * c1) & 0xffffffff
+            k = ((k << 15) | (k >> 17)) & 0xffffffff
+            k = (k * c2) & 0xffffffff
+            h ^= k
+
+        h ^= length
+        h ^= h >> 16
+        h = (h * 0x85ebca6b) & 0xffffffff
+        h ^= h >> 13
+        h = (h * 0xc2b2ae35) & 0xffffffff
+        h ^= h >> 16
+        return h
@@ -0,0 +1,178 @@
+# Python
+import os
+import stat
+import time
+import shutil
+import tarfile
+import zipfile
+
+# GroundSeg modules
+from log import Log
+
+class PierExtractor:
+
+    # Bytes copied per read
+    _buffer_size = 1024 * 1024
+
+    # Seconds between progress callbacks
+    _report_interval = 0.5
+
+    # Extract into data_dir/unused, then rename the ship's directory to data_dir/patp.
+    # Everything else in the archive stays in unused like the old restructure pass.
+    def __init__(self, patp, data_dir):
+        self.patp = patp
+        self.data_dir = data_dir
+        self.staging = os.path.join(data_dir, 'unused')
+
+        # Shared with upload_status, updated as the archive is read
+        self.progress = {'current': 0, 'total': 0}
+
+        # Called at most every _report_interval as progress moves
+        self.on_progress = None
+        self._reported = 0
+
+        # Directories containing a .urb, relative to staging
+        self._urb_roots = set()
+
+    # Pick the extractor from the file name
+    def extract_file(self, path):
+        if path.endswith("zip"):
+            self.extract_zip(path)
+        elif path.endswith("tar.gz") or path.endswith("tgz") or path.endswith("tar"):
+            self.progress['total'] = os.path.getsize(path)
+            with open(path, 'rb') as f:
+                self.extract_tar(f)
+        else:
+            raise Exception("Unsupported archive type")
+
+    # Single pass over a tar stream, progress is compressed bytes read
+    def extract_tar(self, fileobj):
+        with tarfile.open(fileobj=_Counter(fileobj, self), mode='r|*') as tar:
+            for m in tar:
+                target = self._target(m.name, m.isdir())
+                if target is None:
+                    continue
+
+                if m.isdir():
+                    os.makedirs(target, exist_ok=True)
+                elif m.isfile():
+                    src = tar.extractfile(m)
+                    self._write(src, target, m.size, m.mode, m.mtime)
+                elif m.issym():
+                    self._symlink(m.linkname, target)
+                else:
+                    Log.log(f"{self.patp}: Skipping {m.name} while extracting")
+
+    # Sizes come from the central directory, progress is bytes written
+    def extract_zip(self, path):
+        with zipfile.ZipFile(path) as zip_ref:
+            infos = zip_ref.infolist()
+            self.progress['total'] = sum((i.file_size for i in infos))
+            for i in infos:
+                target = self._target(i.filename, i.is_dir())
+                if target is None:
+                    continue
+
+                if i.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                else:
+                    mode = i.external_attr >> 16
+                    with zip_ref.open(i) as src:
+                        self._write(src, target, i.file_size, mode, None, count=True)
+
+    # Move the ship into place, returns an error message or None
+    def relocate(self):
+        if len(self._urb_roots) > 1:
+            text = f"Multiple ships ({len(self._urb_roots)}) detected in pier directory"
+            Log.log(f"{self.patp}: {text}")
+            return text
+        if len(self._urb_roots) < 1:
+            Log.log(f"{self.patp}: No ships detected in pier directory")
+            return "No Urbit ship found in pier directory"
+
+        root = os.path.join(self.staging, *next(iter(self._urb_roots)))
+        pier_dir = os.path.join(self.data_dir, self.patp)
+        Log.log(f"{self.patp}: .urb subdirectory in {root}")
+
+        if os.path.exists(pier_dir):
+            shutil.rmtree(pier_dir)
+        os.rename(root, pier_dir)
+
+        # drop unused if the ship was all it held
+        try:
+            os.rmdir(self.staging)
+        except OSError:
+            pass
+
+        Log.log(f"{self.patp}: Pier moved to {pier_dir}")
+        return None
+
+    # Count bytes and report now and then
+    def advance(self, n):
+        self.progress['current'] += n
+        if self.on_progress is not None:
+            now = time.monotonic()
+            if now - self._reported >= self._report_interval:
+                self._reported = now
+                self.on_progress()
+
+    # Path under staging, None if the member would land outside it
+    def _target(self, name, is_dir):
+        parts = [p for p in name.replace('\\', '/').split('/') if p not in ('', '.')]
+        if len(parts) < 1 or '..' in parts:
+            if len(parts) > 0:
+                Log.log(f"{self.patp}: Refusing to extract {name}")
+            return None
+
+        # note where the .urb is while we're here
+        if '.urb' in parts and '__MACOSX' not in parts:
+            i = parts.index('.urb')
+            if i < len(parts) - 1 or is_dir:
+                self._urb_roots.add(tuple(parts[:i]))
+
+        return os.path.join(self.staging, *parts)
+
+    # Copy in large blocks, leaving holes where the data is all zeros
+    def _write(self, src, target, size, mode, mtime, count=False):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            # sparse file of the final size, only non-zero blocks get written
+            f.truncate(size)
+            while True:
+                buf = src.read(self._buffer_size)
+                if not buf:
+                    break
+                if buf.count(0) == len(buf):
+                    f.seek(len(buf), 1)
+                else:
+                    f.write(buf)
+                if count:
+                    self.advance(len(buf))
+
+        if mode:
+            os.chmod(target, stat.S_IMODE(mode))
+        if mtime:
+            os.utime(target, (mtime, mtime))
+
+    # Only relative links that stay inside the archive
+    def _symlink(self, link, target):
+        resolved = os.path.normpath(os.path.join(os.path.dirname(target), link))
+        if os.path.isabs(link) or not resolved.startswith(self.staging + os.sep):
+            Log.log(f"{self.patp}: Skipping link {target} -> {link}")
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.lexists(target):
+            os.remove(target)
+        os.symlink(link, target)
+
+
+# Counts bytes read from the archive
+class _Counter:
+    def __init__(self, fileobj, extractor):
+        self._fileobj = fileobj
+        self._extractor = extractor
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        self._extractor.advance(len(data))
+        return data
@@ -0,0 +1,139 @@
+# Python
+import os
+import json
+from threading import Lock
+
+# GroundSeg modules
+from log import Log
+from debounced_writer import DebouncedWriter
+
+class PierStore:
+
+    # Pier configs live in settings/pier/<patp>.json, or all in settings/piers.json
+    def __init__(self, base_path, piers, single_file=False):
+        self._dir = f"{base_path}/settings/pier"
+        self._single_path = f"{base_path}/settings/piers.json"
+        self._piers = piers
+        self.single_file = single_file
+
+        # last contents written per pier, to skip saves that change nothing
+        self._saved = {}
+        self._writers = {}
+        self._lock = Lock()
+
+        # piers.json as read from disk
+        self._single = None
+
+        # per-pier files to remove once piers.json holds them
+        self._migrated = set()
+        self._pending = set()
+
+    # Pier config from disk, None if there is none
+    def load(self, patp):
+        if self.single_file:
+            cfg = self._load_single(patp)
+            if cfg is None:
+                cfg = self._load_file(patp)
+                if cfg is not None:
+                    self._migrated.add(patp)
+        else:
+            cfg = self._load_file(patp)
+            if cfg is None:
+                cfg = self._load_single(patp)
+
+        if cfg is not None:
+            self._saved[patp] = json.dumps(cfg, indent = 4)
+        return cfg
+
+    # Mark a pier dirty, written shortly after unless nothing changed
+    def save(self, patp):
+        text = json.dumps(self._piers[patp], indent = 4)
+        with self._lock:
+            if self._saved.get(patp) == text and patp not in self._migrated:
+                return True
+            self._writer(patp).schedule()
+        return True
+
+    # Forget a pier and remove its config, .bak included since it holds the minio password
+    def remove(self, patp):
+        w = None
+        with self._lock:
+            self._saved.pop(patp, None)
+            self._migrated.discard(patp)
+            if self._single is not None:
+                self._single.pop(patp, None)
+
+            if self.single_file:
+                single = self._writer(patp)
+                single.schedule()
+            else:
+                w = self._writers.pop(patp, None)
+
+        # outside the lock, the writer may be mid-write
+        if w is not None:
+            w.cancel()
+
+        # piers.json.bak still has the pier until it's written over now
+        if self.single_file:
+            single.flush()
+            single.refresh_backup()
+
+        for path in [f"{self._dir}/{patp}.json", f"{self._dir}/{patp}.json.bak"]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _writer(self, patp):
+        key = None if self.single_file else patp
+        if key not in self._writers:
+            if self.single_file:
+                self._writers[key] = DebouncedWriter(self._single_path, self._dump_all, "Piers",
+                                                     after_write=self._remove_migrated)
+            else:
+                self._writers[key] = DebouncedWriter(f"{self._dir}/{patp}.json",
+                                                     lambda: self._dump(patp), patp)
+        return self._writers[key]
+
+    def _dump(self, patp):
+        text = json.dumps(self._piers[patp], indent = 4)
+        self._saved[patp] = text
+        return text
+
+    # Piers not loaded this run are kept as they were
+    def _dump_all(self):
+        self._load_single(None)
+        piers = {**self._single, **self._piers}
+        for patp, cfg in piers.items():
+            self._saved[patp] = json.dumps(cfg, indent = 4)
+
+        with self._lock:
+            self._pending = {p for p in self._migrated if p in piers}
+            self._migrated -= self._pending
+        return json.dumps(piers, indent = 4)
+
+    def _remove_migrated(self):
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        for patp in pending:
+            try:
+                os.remove(f"{self._dir}/{patp}.json")
+                Log.log(f"{patp}: Config moved to piers.json")
+            except FileNotFoundError:
+                pass
+
+    def _load_file(self, patp):
+        try:
+            with open(f"{self._dir}/{patp}.json") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _load_single(self, patp):
+        if self._single is None:
+            try:
+                with open(self._single_path) as f:
+                    self._single = json.load(f)
+            except FileNotFoundError:
+                self._single = {}
+        return self._single.get(patp)
@@ -0,0 +1,115 @@
+# Python
+import time
+import string
+import secrets
+from threading import Lock
+
+# GroundSeg modules
+from log import Log
+
+class SessionStore:
+
+    # Seconds a session may go unused
+    _idle = 60 * 60 * 24 * 30
+
+    # Seconds a session lives after login, used or not
+    _absolute = 60 * 60 * 24 * 90
+
+    # Most sessions kept, the least recently seen go first
+    _cap = 64
+
+    # Seconds between saving last-seen times to system.json
+    _persist_interval = 60 * 15
+
+    # config['sessions'] is sid -> {"created", "seen"}, saved with system.json
+    def __init__(self, config_object):
+        self.config_object = config_object
+        self.config = config_object.config
+        self._lock = Lock()
+        self._persisted = time.time()
+
+        # older system.json kept a plain list of sids
+        sessions = self.config.get('sessions')
+        if type(sessions) is not dict:
+            now = int(time.time())
+            sessions = {sid: {"created": now, "seen": now} for sid in (sessions or [])}
+            Log.log(f"Login: Migrated {len(sessions)} sessions")
+        self.config['sessions'] = sessions
+        self._sessions = sessions
+
+        self.expire()
+
+    # New session id
+    def create(self):
+        sid = ''.join(secrets.choice(
+            string.ascii_uppercase +
+            string.ascii_lowercase +
+            string.digits) for i in range(64))
+
+        now = int(time.time())
+        with self._lock:
+            self._sessions[sid] = {"created": now, "seen": now}
+            self._expire(now)
+            while len(self._sessions) > self._cap:
+                oldest = min(self._sessions, key=lambda s: self._sessions[s]['seen'])
+                self._sessions.pop(oldest)
+                Log.log("Login: Session limit reached, dropped least recently used")
+        self._save()
+        return sid
+
+    # True if the session is valid, marks it as seen
+    def check(self, sid):
+        if type(sid) is not str:
+            return False
+
+        now = int(time.time())
+        s = self._sessions.get(sid)
+        if s is None:
+            return False
+
+        if self._expired(s, now):
+            self.remove(sid)
+            return False
+
+        s['seen'] = now
+
+        # last-seen only matters across restarts, don't write it every request
+        if now - self._persisted > self._persist_interval:
+            self._save()
+        return True
+
+    def remove(self, sid):
+        with self._lock:
+            found = self._sessions.pop(sid, None) is not None
+        if found:
+            self._save()
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+        self._save()
+
+    def count(self):
+        return len(self._sessions)
+
+    # Drop expired sessions
+    def expire(self):
+        with self._lock:
+            dropped = self._expire(int(time.time()))
+        if dropped > 0:
+            Log.log(f"Login: Expired {dropped} sessions")
+            self._save()
+
+    def _expire(self, now):
+        expired = [sid for sid, s in self._sessions.items() if self._expired(s, now)]
+        for sid in expired:
+            self._sessions.pop(sid)
+        return len(expired)
+
+    def _expired(self, s, now):
+        return now - s['seen'] > self._idle or now - s['created'] > self._absolute
+
+    def _save(self):
+        self._persisted = time.time()
+        self.config_object.save_config()
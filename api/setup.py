@@ -6,7 +6,7 @@ class Setup:
         if 'endpoint' in data:
             endpoint = data['endpoint']
             api_version = config['apiVersion']
-            url = f"https://{endpoint}/{api_version}"
+            url = f"{config['endpointScheme']}://{endpoint}/{api_version}"
             if wg.get_regions(url, tries=1):
                 res['regions'] = Utils.convert_region_data(wg.region_data)
                 res['error'] = 0
@@ -25,7 +25,7 @@ class Setup:
         if changed == 200:
             endpoint = config.config['endpointUrl']
             api_version = config.config['apiVersion']
-            url = f"https://{endpoint}/{api_version}"
+            url = f"{config.config['endpointScheme']}://{endpoint}/{api_version}"
             if wg.build_anchor(url, data['key'], data['region']):
                 minio.start_mc()
                 config.config['wgRegistered'] = True
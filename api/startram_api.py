@@ -0,0 +1,92 @@
+# Python
+import random
+from time import sleep
+
+# Modules
+import requests
+from requests.adapters import HTTPAdapter
+
+# GroundSeg modules
+from log import Log
+from utils import Utils
+
+class StarTramAPI:
+
+    _headers = {"Content-Type": "application/json"}
+
+    # (connect, read) seconds per endpoint
+    _timeouts = {
+            "regions": (5, 15),
+            "retrieve": (5, 15),
+            "register": (5, 30),
+            "create": (5, 30),
+            "create/alias": (5, 30),
+            "delete": (5, 30),
+            "stripe/cancel": (5, 30)
+            }
+    _default_timeout = (5, 30)
+
+    # Backoff between tries, doubled each time up to the cap, full jitter
+    _backoff_base = 1
+    _backoff_cap = 30
+
+    # Connections kept open to the StarTram API
+    _pool_size = 8
+
+    def __init__(self):
+        self._session = requests.Session()
+        self._session.headers.update(self._headers)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self._pool_size, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    # /v1/regions
+    def regions(self, url, tries=3):
+        return self._call("get", url, "regions", tries)
+
+    # /v1/retrieve, concurrent callers share one request
+    def retrieve(self, url, pubkey, tries=1):
+        return Utils.single_flight(f"retrieve:{url}:{pubkey}",
+                                   lambda: self._call("get", url, "retrieve", tries,
+                                                      params={"pubkey": pubkey}))
+
+    # /v1/register
+    def register(self, url, data):
+        return self._call("post", url, "register", 1, json=data)
+
+    # /v1/create
+    def create(self, url, data, tries=1):
+        return self._call("post", url, "create", tries, json=data)
+
+    # /v1/create/alias, post to add or delete to remove
+    def alias(self, url, data, method):
+        return self._call(method, url, "create/alias", 1, json=data)
+
+    # /v1/delete
+    def delete(self, url, data):
+        return self._call("post", url, "delete", 1, json=data)
+
+    # /v1/stripe/cancel
+    def cancel(self, url, data):
+        return self._call("post", url, "stripe/cancel", 1, json=data)
+
+    # Seconds to wait before try n (from 0)
+    def backoff(self, n):
+        return random.uniform(0, min(self._backoff_cap, self._backoff_base * (2 ** n)))
+
+    # Parsed JSON response, raises once every try has failed
+    def _call(self, method, url, endpoint, tries, **kwargs):
+        timeout = self._timeouts.get(endpoint, self._default_timeout)
+        for n in range(tries):
+            try:
+                res = self._session.request(method, f"{url}/{endpoint}", timeout=timeout, **kwargs)
+                # StarTram answers 4xx with a json error body, only retry server errors
+                if res.status_code >= 500:
+                    res.raise_for_status()
+                return res.json()
+            except Exception as e:
+                if n >= tries - 1:
+                    raise
+                t = self.backoff(n)
+                Log.log(f"Anchor: /{endpoint} failed: {e}, trying again in {t:.1f} seconds")
+                sleep(t)
@@ -0,0 +1,202 @@
+# Local stand-in for the StarTram API, for trying the anchor code without an account.
+#
+#   python3 startram_mock.py --port 8089
+#
+# then set endpointScheme to "http" and endpointUrl to "127.0.0.1:8089" in system.json.
+# Subdomains end in endpointUrl minus its first label, the same way GroundSeg reads them.
+
+# Python
+import sys
+import json
+import time
+import random
+import base64
+import argparse
+from threading import Thread, Lock
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class StarTramMock:
+
+    # wg0.conf handed out, privkey is replaced by the client
+    _conf = "[Interface]\nPrivateKey = privkey\nAddress = 10.13.13.2\n"
+
+    def __init__(self, host='127.0.0.1', port=8089, pub_url=None,
+                 create_delay=2, fail_rate=0, latency=0):
+        self.create_delay = create_delay    # seconds a service stays 'creating'
+        self.fail_rate = fail_rate          # share of requests answered with a 503
+        self.latency = latency              # seconds added to every response
+        self.regions = {"us-east": {"country": "US", "desc": "US East"},
+                        "eu-central": {"country": "DE", "desc": "EU Central"}}
+        self.devices = {}
+        self.requests = {}
+        self._next_port = 30000
+        self._lock = Lock()
+
+        mock = self
+        class Handler(_Handler):
+            server_mock = mock
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+        self.endpoint = f"{host}:{self.port}"
+        self.url = f"http://{self.endpoint}/v1"
+        if pub_url is None:
+            pub_url = '.'.join(self.endpoint.split('.')[1:])
+        self.pub_url = pub_url
+
+    def start(self):
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, method, path, query, body):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+        if path == "/v1/regions" and method == "GET":
+            return 200, self.regions
+
+        if path == "/v1/register" and method == "POST":
+            if body.get('region') not in self.regions:
+                return 200, {"error": 1, "debug": "unknown region"}
+            with self._lock:
+                self.devices[body['pubkey']] = {"region": body['region'], "subdomains": []}
+            return 200, {"error": 0, "lease": "2099-01-01"}
+
+        dev = self._device(query, body)
+        if dev is None:
+            return 200, {"error": 1, "debug": "unknown pubkey"}
+
+        if path == "/v1/retrieve" and method == "GET":
+            return 200, self._retrieve(dev)
+
+        if path == "/v1/create" and method == "POST":
+            self._create(dev, body['subdomain'], body['svc_type'])
+            return 200, {"error": 0, "status": "creating"}
+
+        if path == "/v1/create/alias" and method in ["POST", "DELETE"]:
+            with self._lock:
+                for ep in dev['subdomains']:
+                    if ep['url'] == f"{body['subdomain']}.{self.pub_url}":
+                        ep['alias'] = body['alias'] if method == "POST" else None
+            return 200, {"error": 0}
+
+        if path == "/v1/delete" and method == "POST":
+            self._delete(dev, body['subdomain'])
+            return 200, {"error": 0}
+
+        if path == "/v1/stripe/cancel" and method == "POST":
+            return 200, {"error": 0}
+
+        return 404, {"error": 1, "debug": "not found"}
+
+    def _device(self, query, body):
+        pubkey = query.get('pubkey', [body.get('pubkey')])[0]
+        return self.devices.get(pubkey)
+
+    def _retrieve(self, dev):
+        now = time.time()
+        with self._lock:
+            for ep in dev['subdomains']:
+                if ep['status'] == 'creating' and now >= ep['ready']:
+                    ep['status'] = 'ok'
+            subdomains = [{k: v for k, v in ep.items() if k != 'ready'} for ep in dev['subdomains']]
+
+        creating = any(ep['status'] == 'creating' for ep in subdomains)
+        return {
+                "conf": base64.b64encode(self._conf.encode()).decode(),
+                "status": "creating" if creating else "ok",
+                "region": dev['region'],
+                "lease": "2099-01-01",
+                "ongoing": 0,
+                "subdomains": subdomains
+                }
+
+    # One service makes the endpoints the client expects
+    def _create(self, dev, subdomain, svc_type):
+        if svc_type == 'urbit':
+            urls = [(subdomain, 'urbit-web'), (f"ames.{subdomain}", 'urbit-ames')]
+        elif svc_type == 'minio':
+            urls = [(subdomain, 'minio'),
+                    (f"bucket.{subdomain}", 'minio-bucket'),
+                    (f"console.{subdomain}", 'minio-console')]
+        else:
+            urls = [(subdomain, svc_type)]
+
+        ready = time.time() + self.create_delay
+        with self._lock:
+            for name, svc in urls:
+                url = f"{name}.{self.pub_url}"
+                if any(ep['url'] == url for ep in dev['subdomains']):
+                    continue
+                self._next_port += 1
+                dev['subdomains'].append({"url": url, "svc_type": svc, "port": self._next_port,
+                                          "alias": None, "status": "creating", "ready": ready})
+
+    def _delete(self, dev, subdomain):
+        with self._lock:
+            dev['subdomains'] = [ep for ep in dev['subdomains']
+                                 if not ep['url'].endswith(f"{subdomain}.{self.pub_url}")]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_mock = None
+
+    def do_GET(self):
+        self._respond("GET")
+
+    def do_POST(self):
+        self._respond("POST")
+
+    def do_DELETE(self):
+        self._respond("DELETE")
+
+    def _respond(self, method):
+        mock = self.server_mock
+        if mock.latency > 0:
+            time.sleep(mock.latency)
+
+        if random.random() < mock.fail_rate:
+            code, res = 503, {"error": 1, "debug": "unavailable"}
+        else:
+            parsed = urlparse(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            body = {}
+            if length > 0:
+                body = json.loads(self.rfile.read(length))
+            try:
+                code, res = mock.handle(method, parsed.path, parse_qs(parsed.query), body)
+            except Exception as e:
+                code, res = 400, {"error": 1, "debug": str(e)}
+
+        data = json.dumps(res).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mock StarTram API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--pub-url', default=None)
+    parser.add_argument('--create-delay', type=float, default=2)
+    parser.add_argument('--fail-rate', type=float, default=0)
+    parser.add_argument('--latency', type=float, default=0)
+    args = parser.parse_args()
+
+    mock = StarTramMock(args.host, args.port, args.pub_url,
+                        args.create_delay, args.fail_rate, args.latency)
+    print(f"StarTram mock listening on {mock.url}", file=sys.stderr)
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
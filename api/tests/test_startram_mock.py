@@ -0,0 +1,49 @@
+# Drives the StarTram client through startram_mock.py
+#
+#   cd api && python -m pytest tests
+
+# Python
+import os
+import sys
+
+# Modules
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# StarTramAPI needs requests and utils' dependencies
+startram_api = pytest.importorskip("startram_api")
+from anchor_status import AnchorStatus
+from startram_mock import StarTramMock
+
+
+@pytest.fixture
+def mock():
+    m = StarTramMock(port=0, create_delay=0.2).start()
+    yield m
+    m.stop()
+
+
+def test_register_create_retrieve(mock):
+    api = startram_api.StarTramAPI()
+    res = api.register(mock.url, {"pubkey": "pub", "region": "us-east", "reg_code": "code"})
+    assert res['error'] == 0
+
+    res = api.create(mock.url, {"subdomain": "~zod", "pubkey": "pub", "svc_type": "urbit"})
+    assert res['error'] == 0
+
+    data = api.retrieve(mock.url, "pub")
+    assert data['region'] == "us-east"
+    assert sorted(ep['svc_type'] for ep in data['subdomains']) == ['urbit-ames', 'urbit-web']
+
+    anchor = AnchorStatus(api, {"pubkey": "pub", "endpointUrl": mock.endpoint})
+    ready = lambda d: all(ep['status'] == 'ok' for ep in d['subdomains'])
+    assert anchor.wait_for(mock.url, ready, timeout=10)
+    assert anchor.service('~zod', 'urbit-web')['status'] == 'ok'
+    assert anchor.service('~zod', 'urbit-ames')['url'] == f"ames.~zod.{mock.pub_url}"
+
+
+def test_create_rejected(mock):
+    api = startram_api.StarTramAPI()
+    res = api.create(mock.url, {"subdomain": "~zod", "pubkey": "unknown", "svc_type": "urbit"})
+    assert res['error'] == 1
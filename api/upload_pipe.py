@@ -0,0 +1,159 @@
+# Python
+import queue
+from time import monotonic
+from threading import Thread, Lock, Event
+
+# GroundSeg modules
+from log import Log
+
+class UploadPipe:
+
+    # Bytes per piece handed to the extractor
+    _piece_size = 1024 * 1024
+
+    # Pieces buffered ahead of the extractor
+    _queue_size = 32
+
+    # Seconds without a chunk before the upload is dropped
+    _ttl = 3600
+
+    # Feed in-order upload chunks straight into a tar extractor
+    def __init__(self, patp, extractor, total_size):
+        self.patp = patp
+        self.extractor = extractor
+        self.extractor.progress['total'] = total_size
+        self.next_chunk = 0
+        self.received = 0
+
+        # bytes of next_chunk already fed, a retry skips them
+        self._chunk_fed = 0
+        self.error = None
+        self.seen = monotonic()
+
+        self._queue = queue.Queue(maxsize=self._queue_size)
+        self._buf = b''
+        self._off = 0
+        self._eof = False
+        self._cancel = Event()
+        self._lock = Lock()
+        self._thread = Thread(target=self._extract, daemon=True)
+        self._thread.start()
+
+    # Returns False once the pipe has failed. A chunk that comes up short
+    # leaves next_chunk where it is, so the retry carries on from there.
+    def feed(self, index, stream, expected):
+        self.seen = monotonic()
+        with self._lock:
+            if self.error is not None:
+                return False
+
+            # resent chunk, we already have it
+            if index < self.next_chunk:
+                Log.log(f"{self.patp}: Ignoring repeated chunk {index}")
+                return True
+
+            # a missing chunk can't be streamed around
+            if index > self.next_chunk:
+                self.abort(f"Expected chunk {self.next_chunk}, got {index}")
+                return False
+
+            skip = self._chunk_fed
+            try:
+                while self._chunk_fed < expected:
+                    try:
+                        piece = stream.read(min(self._piece_size, expected - self._chunk_fed + skip))
+                    except Exception as e:
+                        Log.log(f"{self.patp}: Chunk {index} read failed: {e}")
+                        break
+                    if not piece:
+                        break
+
+                    # the part of a retried chunk we already have
+                    if skip > 0:
+                        drop = min(skip, len(piece))
+                        piece = piece[drop:]
+                        skip -= drop
+                        if not piece:
+                            continue
+
+                    self._put(piece)
+                    self._chunk_fed += len(piece)
+                    self.received += len(piece)
+            except BrokenPipeError:
+                return False
+
+            if self._chunk_fed < expected:
+                Log.log(f"{self.patp}: Chunk {index} short at {self._chunk_fed} of {expected} bytes")
+                return True
+
+            self._chunk_fed = 0
+            self.next_chunk += 1
+            self.seen = monotonic()
+            return True
+
+    # True once the browser has stopped sending
+    def expired(self):
+        return monotonic() - self.seen > self._ttl
+
+    # Wait for the extractor to finish the archive
+    def finish(self):
+        # an aborted pipe doesn't wait on a feed that may be stuck reading
+        if not self._cancel.is_set():
+            with self._lock:
+                try:
+                    self._put(None)
+                except BrokenPipeError:
+                    pass
+        self._thread.join()
+        return self.error
+
+    def abort(self, error):
+        if self.error is None:
+            self.error = error
+            Log.log(f"{self.patp}: Upload stream failed: {error}")
+        self._cancel.set()
+
+    def _extract(self):
+        try:
+            self.extractor.extract_tar(self)
+            # trailing data past the end of the archive
+            while not self._eof and self._get() is not None:
+                pass
+        except Exception as e:
+            self.abort(f"Extraction failed: {e}")
+
+    # Called by tarfile from the extractor thread
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buf) - self._off < size):
+            piece = self._get()
+            if piece is None:
+                self._eof = True
+                break
+            self._buf = self._buf[self._off:] + piece
+            self._off = 0
+
+        if size < 0:
+            size = len(self._buf) - self._off
+        data = self._buf[self._off:self._off + size]
+        self._off += len(data)
+        return data
+
+    # Block while the extractor is behind, give up if it failed
+    def _put(self, piece):
+        while True:
+            if self._cancel.is_set():
+                raise BrokenPipeError("extraction stopped")
+            try:
+                self._queue.put(piece, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self):
+        while True:
+            if self._cancel.is_set():
+                raise Exception("upload aborted")
+            try:
+                return self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
@@ -0,0 +1,317 @@
+# Python
+import os
+import json
+import time
+import hashlib
+from threading import Lock, Condition
+
+# GroundSeg modules
+from log import Log
+from utils import Utils
+
+class UploadSessions:
+
+    # Bytes copied from the request per write
+    _copy_size = 1024 * 1024
+
+    # Seconds without a chunk before an upload is dropped
+    _ttl = 3600
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = Lock()
+
+    # Session for an upload, a new uuid starts the file over
+    def start(self, patp, uuid, path, total_size, total_chunks):
+        with self._lock:
+            s = self._sessions.get(patp)
+            if s is not None and s['uuid'] == uuid:
+                s['seen'] = time.monotonic()
+                return s
+
+            if s is not None:
+                Log.log(f"{patp}: Replacing unfinished upload")
+                self._close(s, remove=False)
+
+            Log.log(f"{patp}: Starting upload")
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            s = self._session(patp, uuid, path, fd, total_size, total_chunks)
+            self._sessions[patp] = s
+            return s
+
+    # Session for a manifest of chunk hashes, resumes a matching upload on disk
+    def start_manifest(self, patp, path, manifest):
+        size = int(manifest['size'])
+        chunk_size = int(manifest['chunk_size'])
+        hashes = [str(h).lower() for h in manifest['hashes']]
+        if chunk_size < 1 or len(hashes) != max((size + chunk_size - 1) // chunk_size, 1):
+            raise Exception("Manifest doesn't match the file size")
+
+        uuid = hashlib.sha256(f"{size}:{chunk_size}:{','.join(hashes)}".encode()).hexdigest()
+        with self._lock:
+            s = self._sessions.get(patp)
+            if s is not None and s['uuid'] == uuid:
+                s['seen'] = time.monotonic()
+                return s
+
+        # hashing what's on disk can take a while, don't hold up other uploads
+        return Utils.single_flight(f"manifest:{patp}:{uuid}",
+                                   lambda: self._resume(patp, uuid, path, manifest, size, chunk_size, hashes))
+
+    def _resume(self, patp, uuid, path, manifest, size, chunk_size, hashes):
+        # pick up where an earlier run left off
+        sidecar = f"{path}.manifest.json"
+        have = []
+        try:
+            with open(sidecar) as f:
+                saved = json.load(f)
+            if saved['uuid'] == uuid and os.path.isfile(path):
+                have = saved['have']
+        except Exception:
+            pass
+
+        # a different upload of this pier still has the file open
+        with self._lock:
+            old = self._sessions.get(patp)
+            if old is not None and old['uuid'] != uuid:
+                Log.log(f"{patp}: Replacing unfinished upload")
+                self._sessions.pop(patp)
+                self._close(old, remove=False)
+
+        flags = os.O_RDWR | os.O_CREAT
+        if len(have) < 1:
+            flags |= os.O_TRUNC
+        fd = os.open(path, flags, 0o644)
+
+        s = self._session(patp, uuid, path, fd, size, len(hashes))
+        s['hashes'] = hashes
+        s['chunk_size'] = chunk_size
+        s['sidecar'] = sidecar
+        s['remote'] = bool(manifest.get('remote', False))
+        s['fix'] = bool(manifest.get('fix', False))
+
+        # data written before a crash may not have reached the disk
+        for index in have:
+            n = self._chunk_length(s, index)
+            if self._hash_range(fd, index * chunk_size, n) == hashes[index]:
+                s['chunks'][index] = n
+        s['progress']['current'] = sum(s['chunks'].values())
+        Log.log(f"{patp}: Upload has {len(s['chunks'])}/{len(hashes)} chunks")
+
+        self._save_sidecar(s)
+        with self._lock:
+            self._sessions[patp] = s
+        return s
+
+    def get(self, patp):
+        with self._lock:
+            return self._sessions.get(patp)
+
+    # Copy a chunk to its offset, chunks may arrive in any order.
+    # A chunk that fails or comes up short isn't counted, so a retry can replace it.
+    def write(self, s, index, offset, stream, expected):
+        if index < 0 or index >= s['total_chunks']:
+            raise Exception(f"Chunk {index} is out of range")
+
+        with s['lock']:
+            s['chunks'].pop(index, None)
+
+        # never past expected, a long chunk would spill into the next one
+        written = 0
+        extra = False
+        try:
+            while written < expected:
+                buf = stream.read(min(self._copy_size, expected - written))
+                if not buf:
+                    break
+                self._pwrite(s, buf, offset + written)
+                written += len(buf)
+            if written == expected:
+                extra = len(stream.read(1)) > 0
+        finally:
+            with s['lock']:
+                if written == expected and not extra:
+                    s['chunks'][index] = written
+                s['progress']['current'] = sum(s['chunks'].values())
+                s['seen'] = time.monotonic()
+
+        if extra:
+            raise Exception(f"Chunk {index} was longer than {expected} bytes")
+        if written != expected:
+            raise Exception(f"Chunk {index} was {written} bytes, expected {expected}")
+        return written
+
+    # Write a manifest chunk, hashing it on the way, returns False if it doesn't match
+    def write_verified(self, s, index, stream):
+        if index < 0 or index >= len(s['hashes']):
+            raise Exception(f"Chunk {index} is not in the manifest")
+
+        offset = index * s['chunk_size']
+        expected = self._chunk_length(s, index)
+
+        # already verified, don't let a resend overwrite good data
+        with s['lock']:
+            done = index in s['chunks']
+        if done:
+            while stream.read(self._copy_size):
+                pass
+            s['seen'] = time.monotonic()
+            return True
+
+        # only counted once the hash matches
+        h = hashlib.sha256()
+        received = 0
+        while True:
+            buf = stream.read(self._copy_size)
+            if not buf:
+                break
+            received += len(buf)
+            # too long, don't spill into the next chunk
+            if received > expected:
+                break
+            h.update(buf)
+            self._pwrite(s, buf, offset + received - len(buf))
+
+        with s['lock']:
+            s['seen'] = time.monotonic()
+            if s['closed']:
+                return False
+            if received != expected or h.hexdigest() != s['hashes'][index]:
+                Log.log(f"{s['patp']}: Chunk {index} failed verification")
+                return False
+
+            s['chunks'][index] = received
+            s['progress']['current'] = sum(s['chunks'].values())
+            self._save_sidecar(s)
+        return True
+
+    # Chunk indices still needed
+    def missing(self, s):
+        with s['lock']:
+            return [i for i in range(s['total_chunks']) if i not in s['chunks']]
+
+    def complete(self, s):
+        with s['lock']:
+            return len(s['chunks']) >= s['total_chunks']
+
+    # Flush to disk once and close, returns the file size or None if already finished
+    def finish(self, s):
+        with self._lock:
+            if self._sessions.get(s['patp']) is not s:
+                return None
+            self._sessions.pop(s['patp'])
+
+        self._shut(s)
+        try:
+            os.fsync(s['fd'])
+            return os.fstat(s['fd']).st_size
+        finally:
+            os.close(s['fd'])
+            self._remove_sidecar(s)
+
+    def discard(self, patp):
+        with self._lock:
+            s = self._sessions.pop(patp, None)
+            if s is not None:
+                self._close(s, remove=True)
+
+    # Drop uploads that stopped sending, returns their patps.
+    # Manifest uploads keep their file and sidecar so they can resume later.
+    def expire(self):
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for patp, s in list(self._sessions.items()):
+                if now - s['seen'] > self._ttl:
+                    Log.log(f"{patp}: Upload expired")
+                    self._sessions.pop(patp)
+                    self._close(s, remove=s['hashes'] is None)
+                    expired.append(patp)
+        return expired
+
+    def _session(self, patp, uuid, path, fd, total_size, total_chunks):
+        lock = Lock()
+        return {
+                "patp": patp,
+                "uuid": uuid,
+                "path": path,
+                "fd": fd,
+                "total_chunks": total_chunks,
+                "chunks": {},                 # index -> bytes written
+                "progress": {"current": 0, "total": total_size},
+                "hashes": None,               # sha256 per chunk for manifest uploads
+                "seen": time.monotonic(),
+                "writers": 0,                 # pwrites in flight, the fd stays open until they're done
+                "closed": False,
+                "lock": lock,
+                "idle": Condition(lock)
+                }
+
+    def _chunk_length(self, s, index):
+        offset = index * s['chunk_size']
+        return min(s['chunk_size'], s['progress']['total'] - offset)
+
+    def _hash_range(self, fd, offset, length):
+        h = hashlib.sha256()
+        while length > 0:
+            buf = os.pread(fd, min(self._copy_size, length), offset)
+            if not buf:
+                break
+            h.update(buf)
+            offset += len(buf)
+            length -= len(buf)
+        return h.hexdigest()
+
+    # Chunks already verified, so a restart doesn't resend them
+    def _save_sidecar(self, s):
+        if s['hashes'] is None:
+            return
+        tmp = f"{s['sidecar']}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({"uuid": s['uuid'], "have": sorted(s['chunks'])}, f)
+        os.replace(tmp, s['sidecar'])
+
+    def _remove_sidecar(self, s):
+        if s['hashes'] is not None:
+            try:
+                os.remove(s['sidecar'])
+            except OSError:
+                pass
+
+    # Write all of buf at offset, refused once the session is closed
+    def _pwrite(self, s, buf, offset):
+        with s['lock']:
+            if s['closed']:
+                raise Exception("Upload was closed")
+            s['writers'] += 1
+        try:
+            view = memoryview(buf)
+            while len(view) > 0:
+                n = os.pwrite(s['fd'], view, offset)
+                view = view[n:]
+                offset += n
+        finally:
+            with s['lock']:
+                s['writers'] -= 1
+                if s['writers'] < 1:
+                    s['idle'].notify_all()
+
+    # Refuse new writes and wait out the ones in flight, so the fd can be closed
+    def _shut(self, s):
+        with s['lock']:
+            s['closed'] = True
+            while s['writers'] > 0:
+                s['idle'].wait()
+
+    def _close(self, s, remove):
+        self._shut(s)
+        try:
+            os.close(s['fd'])
+        except OSError:
+            pass
+        if remove:
+            self._remove_sidecar(s)
+            try:
+                os.remove(s['path'])
+            except OSError:
+                pass
@@ -7,23 +7,22 @@ import socket
 import shutil
 import string
 import secrets
-import zipfile
-import tarfile
 
-from io import BytesIO
 from time import sleep
-from pathlib import Path
 from threading import Thread
 from datetime import datetime
-
-# Flask
-from flask import send_file
+from concurrent.futures import ThreadPoolExecutor
 
 # GroundSeg Modules
 from log import Log
 from utils import Utils
+from patp import Patp
+from archive_streamer import ArchiveStreamer
+from pier_extractor import PierExtractor
+from pier_store import PierStore
 from urbit_docker import UrbitDocker
 from click_wrapper import Click
+from conn_pool import ConnPool
 
 default_pier_config = {
         "pier_name":"",
@@ -63,9 +62,10 @@ class Urbit:
 
     _volume_directory = '/var/lib/docker/volumes'
 
-    def __init__(self, config, wg, minio):
+    def __init__(self, config, wg, minio, ws_util=None):
         self.config_object = config
         self.config = config.config
+        self.ws_util = ws_util
 
         self._volume_directory = f"{self.config['dockerData']}/volumes"
 
@@ -75,6 +75,17 @@ class Urbit:
         self.urb_docker = UrbitDocker()
         self._urbits = {}
 
+        # Per pier state that only lives as long as the container runs
+        self._runtime = {}
+
+        # Hoon threads over each ship's conn.sock
+        self.conn = ConnPool(self._volume_directory)
+
+        # Pier configs on disk, writes are coalesced
+        self.store = PierStore(self.config_object.base_path,
+                               self._urbits,
+                               self.config['pierStoreSingleFile'])
+
         branch = self.config['updateBranch']
 
         # Updater Urbit information
@@ -100,6 +111,7 @@ class Urbit:
         self.urb_docker.exec(patp, f"cat {patp}/.vere.lock")
         if self.urb_docker.exec(patp, f"kill $(cat {patp}/.vere.lock"):
             self.urb_docker.exec(patp, f"cat {patp}/.vere.lock")
+            self.conn.close(patp)
             return self.urb_docker.stop(patp)
                 
 
@@ -111,7 +123,7 @@ class Urbit:
 
                 endpoint = self.config['endpointUrl']
                 api_version = self.config['apiVersion']
-                url = f'https://{endpoint}/{api_version}'
+                url = f"{self.config['endpointScheme']}://{endpoint}/{api_version}"
 
                 if self.config['wgRegistered']:
                     self.wg.delete_service(f'{patp}','urbit',url)
@@ -123,10 +135,13 @@ class Urbit:
                 self.config['piers'] = [i for i in self.config['piers'] if i != patp]
                 self.config_object.save_config()
 
-                Log.log(f"{patp}: Removing {patp}.json")
-                os.remove(f"/opt/nativeplanet/groundseg/settings/pier/{patp}.json")
-
+                # out of _urbits first, piers.json is written without it
+                self.conn.close(patp)
                 self._urbits.pop(patp)
+
+                Log.log(f"{patp}: Removing {patp}.json")
+                self.store.remove(patp)
+                self._runtime.pop(patp, None)
                 Log.log(f"{patp}: Data removed from GroundSeg")
 
                 return 200
@@ -136,32 +151,22 @@ class Urbit:
 
         return 400
 
-    def export(self, patp):
+    # Stream the pier as it is compressed, rng and if_range allow resuming a tar
+    def export(self, patp, fmt='zip', level=None, rng=None, if_range=None):
         Log.log(f"{patp}: Attempting to export pier")
         c = self.urb_docker.get_container(patp)
         if c:
             if c.status == "running":
                 self.stop(patp)
 
-            file_name = f"{patp}.zip"
-            memory_file = BytesIO()
-            file_path=f"{self._volume_directory}/{patp}/_data/"
-
+            # all of _data, like the zip export always had
             Log.log(f"{patp}: Compressing pier")
+            archive = ArchiveStreamer(patp, f"{self._volume_directory}/{patp}/_data", '',
+                                      fmt, level, skip=['conn.sock'])
+            return archive.response(rng, if_range)
 
-            with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(file_path):
-                    arc_dir = root[root.find("_data/")+6:]
-                    for file in files:
-                        if file != 'conn.sock':
-                            zipf.write(os.path.join(root, file), arcname=os.path.join(arc_dir,file))
-                        else:
-                            Log.log(f"{patp}: Skipping {file} while compressing")
-
-            memory_file.seek(0)
-
-            Log.log(f"{patp}: Pier successfully exported")
-            return send_file(memory_file, download_name=file_name, as_attachment=True)
+        Log.log(f"{patp}: Export failed: container not found")
+        return 400
 
 
     # Start all valid containers
@@ -172,12 +177,17 @@ class Urbit:
             Log.log("Urbit: No ships detected in system.json! Skipping..")
             return True
 
-        for p in patps:
-            status = self.start(p)
-            try:
-                res[status].append(p)
-            except Exception as e:
-                Log.log(f"{p}: {e}")
+        # Piers are independent, boot several at once
+        workers = max(int(self.config['bootWorkers']), 1)
+        Log.log(f"Urbit: Booting {len(patps)} ships with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            started = [pool.submit(self.start, p) for p in patps]
+            for p, f in zip(patps, started):
+                try:
+                    status = f.result()
+                    res[status].append(p)
+                except Exception as e:
+                    Log.log(f"{p}: {e}")
 
         Log.log(f"Urbit: Start succeeded {res['succeeded']}")
         Log.log(f"Urbit: Start ignored {res['ignored']}")
@@ -191,15 +201,21 @@ class Urbit:
         urbits = []
         try:
             if len(self.config['piers']) > 0:
-                for patp in self.config['piers']:
+                # one lookup for the whole fleet
+                containers = self.urb_docker.list_containers()
+                hostname = Utils.get_hostname()
+                # in @p order, like the ships themselves
+                for patp in sorted(self.config['piers'], key=Patp.sort_key):
                     try:
                         u = dict()
-                        c = self.urb_docker.get_container(patp)
-                        if c:
+                        c = containers.get(patp)
+                        if not c:
+                            Log.log(f"{patp}: Container not found")
+                        else:
                             cfg = self._urbits[patp]
                             u['name'] = patp
                             u['running'] = c.status == "running"
-                            u['url'] = f'http://{socket.gethostname()}.local:{cfg["http_port"]}'
+                            u['url'] = f'http://{hostname}.local:{cfg["http_port"]}'
                             u['remote'] = False
 
                             if cfg['network'] == 'wireguard':
@@ -235,6 +251,7 @@ class Urbit:
             # Generate config file for pier
             cfg = self.build_config(patp, http_port, ames_port)
             self._urbits[patp] = cfg
+            self.set_click(patp, cfg['click'])
 
             self.save_config(patp)
 
@@ -245,7 +262,7 @@ class Urbit:
                     # Register the service
                     endpoint = self.config['endpointUrl']
                     api_version = self.config['apiVersion']
-                    url = f"https://{endpoint}/{api_version}"
+                    url = f"{self.config['endpointScheme']}://{endpoint}/{api_version}"
                     if self.register_urbit(patp, url):
                         # Create the docker container
                         if self.start(patp, key) == "succeeded":
@@ -298,142 +315,92 @@ class Urbit:
 
         if Utils.check_patp(patp):
             Log.log(f"{patp}: Booting existing pier")
-            extracted = self.extract_pier(filename)
-            if extracted != "to-create":
-                self.config_object.upload_status.pop(patp)
-                return extracted
-
-            created = self.create_existing(patp)
-            if created != "succeeded":
-                self.config_object.upload_status.pop(patp)
-                return created
-            if remote:
-                Thread(target=self.new_pier_remote_toggle, args=(patp,), daemon=True).start()
-            if fix:
-                Thread(target=self.fix_pokes, args=(patp,), daemon=True).start()
-            self.config_object.upload_status[patp] = {'status':'done'}
-            return 200
+            return self.boot_extracted(patp, self.extract_pier(filename), remote, fix)
 
         return "File is invalid"
 
+    # Boot a pier once extraction is done
+    def boot_extracted(self, patp, extracted, remote, fix):
+        if extracted != "to-create":
+            self.clear_upload_status(patp)
+            return extracted
+
+        created = self.create_existing(patp)
+        if created != "succeeded":
+            self.clear_upload_status(patp)
+            return created
+        if remote:
+            Thread(target=self.new_pier_remote_toggle, args=(patp,), daemon=True).start()
+        if fix:
+            Thread(target=self.fix_pokes, args=(patp,), daemon=True).start()
+        self.set_upload_status(patp, 'done')
+        return 200
+
 
     def extract_pier(self, filename):
         patp = filename.split('.')[0]
-        vol_dir = f'{self._volume_directory}/{patp}'
         compressed_dir = f"{self.config_object.base_path}/uploaded/{patp}/{filename}"
 
         try:
-            # Remove directory and make new empty one
-            self.config_object.upload_status[patp] = {'status':'setup'}
-            Log.log(f"{patp}: Removing existing volume")
-            shutil.rmtree(f"{vol_dir}", ignore_errors=True)
-            Log.log(f"{patp}: Creating volume directory")
-            os.system(f'mkdir -p {vol_dir}/_data')
+            self.set_upload_status(patp, 'setup')
+            extractor = self.prepare_extract(patp)
 
             # Begin extraction
             Log.log(f"{patp}: Extracting {filename}")
-
-            # Zipfile
-            if filename.endswith("zip"):
-                with zipfile.ZipFile(compressed_dir) as zip_ref:
-                    total_size = sum((file.file_size for file in zip_ref.infolist()))
-                    self.config_object.upload_status[patp] = {
-                            'status':'extracting',
-                            'progress':{
-                                'current':0,
-                                'total': total_size
-                                }
-                            }
-                    zip_ref.extractall(f"{vol_dir}/_data")
-
-            # Tarball
-            elif filename.endswith("tar.gz") or filename.endswith("tgz") or filename.endswith("tar"):
-                with tarfile.open(compressed_dir, "r") as tar_ref:
-                    total_size = sum((member.size for member in tar_ref.getmembers()))
-                    self.config_object.upload_status[patp] = {
-                            'status':'extracting',
-                            'progress':{
-                                'current':0,
-                                'total': total_size
-                                }
-                            }
-                    tar_ref.extractall(f"{vol_dir}/_data")
+            self.set_upload_status(patp, 'extracting', extractor.progress)
+            extractor.extract_file(compressed_dir)
 
         except Exception as e:
             Log.log(f"{patp}: Failed to extract {filename}: {e}")
+            self.discard_extract(patp)
             return "File extraction failed"
 
-        # Restructure directory
+        return self.place_pier(patp, extractor)
+
+    # Extract next to the volume's _data, the existing pier stays until the upload succeeds
+    def prepare_extract(self, patp):
+        staging = f'{self._volume_directory}/{patp}/_staging'
+        Log.log(f"{patp}: Creating staging directory")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging, exist_ok=True)
+        extractor = PierExtractor(patp, staging)
+        extractor.on_progress = lambda: self.upload_broadcast(patp)
+        return extractor
+
+    # Drop a failed extraction, the volume is untouched
+    def discard_extract(self, patp):
+        shutil.rmtree(f'{self._volume_directory}/{patp}/_staging', ignore_errors=True)
+
+    # Move the extracted pier into place and clean up the upload
+    def place_pier(self, patp, extractor):
+        # Move the ship found during extraction into place, then swap staging in as _data
         try:
-            # Get all .urb locations in directory
-            data_dir = os.path.join(vol_dir, '_data')
-            urb_loc = []
-            for root, dirs, files in os.walk(data_dir):
-                if ('.urb' in dirs) and ('__MACOSX' not in root):
-                    urb_loc.append(root)
-
-            # Fail if more than one .urb exists
-            if len(urb_loc) > 1:
-                text = f"Multiple ships ({len(urb_loc)}) detected in pier directory"
-                Log.log(f"{patp}: {text}")
+            text = extractor.relocate()
+            if text is not None:
+                self.discard_extract(patp)
                 return text
-            if len(urb_loc) < 1:
-                Log.log(f"{patp}: No ships detected in pier directory")
-                return "No Urbit ship found in pier directory"
-
-            Log.log(f"{patp}: .urb subdirectory in {urb_loc[0]}")
-
-            pier_dir = os.path.join(data_dir, patp)
-            temp_dir = os.path.join(data_dir, 'temp_dir')
-            unused_dir = os.path.join(data_dir, 'unused')
-
-            # check if .urb is in the correct location 
-            if os.path.join(pier_dir, '.urb') != os.path.join(urb_loc[0], '.urb'):
-                Log.log(f"{patp}: .urb location incorrect!")
-                Log.log(f"{patp}: Restructuring directory structure")
-
-                # move to temp dir
-                Log.log(f"{patp}: .urb found in {urb_loc[0]}")
-                Log.log(f"{patp}: Moving to {temp_dir}")
-                if data_dir == urb_loc[0]: # .urb in root
-                    # Create directory
-                    os.makedirs(temp_dir, exist_ok=True)
-                    # select everything in root except for pier_dir
-                    items = [x for x in list(Path(urb_loc[0]).iterdir()) if str(x) != pier_dir]
-                    Log.log(f"{patp}: Items to move: {items}")
-                    for item in items:
-                        shutil.move(str(item), temp_dir)
-                else:
-                    shutil.move(urb_loc[0], temp_dir)
-
-                # rename directories
-                unused = [str(x) for x in list(Path(data_dir).iterdir()) if (str(x) != temp_dir) and (str(x) != unused_dir)]
-                if len(unused) > 0:
-                    # Create directory
-                    os.makedirs(unused_dir, exist_ok=True)
-                    Log.log(f"{patp}: Moving unused items to {unused_dir}")
-                    for u in unused:
-                        Log.log(f"{patp}: Unused items to move: {unused}")
-                        shutil.move(u, unused_dir)
 
-                shutil.move(temp_dir, pier_dir)
-
-                Log.log(f"{patp}: Restructuring done!")
-            else:
-                Log.log(f"{patp}: No restructuring needed!")
+            vol_dir = f'{self._volume_directory}/{patp}'
+            Log.log(f"{patp}: Replacing volume data")
+            shutil.rmtree(f"{vol_dir}/_data.old", ignore_errors=True)
+            if os.path.exists(f"{vol_dir}/_data"):
+                os.rename(f"{vol_dir}/_data", f"{vol_dir}/_data.old")
+            os.rename(extractor.data_dir, f"{vol_dir}/_data")
+            shutil.rmtree(f"{vol_dir}/_data.old", ignore_errors=True)
 
         except Exception as e:
             Log.log(f"{patp}: Failed to restructure directory: {e}")
+            self.discard_extract(patp)
             return f"Failed to restructure {patp}"
 
         try:
-            self.config_object.upload_status[patp] = {'status':'cleaning'}
+            self.set_upload_status(patp, 'cleaning')
             shutil.rmtree(f"{self.config_object.base_path}/uploaded/{patp}", ignore_errors=True)
-            Log.log(f"{patp}: Deleted {filename}")
+            Log.log(f"{patp}: Deleted uploaded files")
 
         except Exception as e:
-            Log.log(f"{patp}: Failed to remove {filename}: {e}")
-            return f"Failed to remove {filename}"
+            Log.log(f"{patp}: Failed to remove uploaded files: {e}")
+            return "Failed to remove uploaded files"
 
         return "to-create"
 
@@ -444,13 +411,14 @@ class Urbit:
             if not Utils.check_patp(patp):
                 raise Exception("Invalid @p")
 
-            self.config_object.upload_status[patp] = {'status':'booting'}
+            self.set_upload_status(patp, 'booting')
             # Get open ports
             http_port, ames_port = self.get_open_urbit_ports()
 
             # Generate config file for pier
             cfg = self.build_config(patp, http_port, ames_port)
             self._urbits[patp] = cfg
+            self.set_click(patp, cfg['click'])
             self.save_config(patp)
 
             # Add to system.json
@@ -458,7 +426,7 @@ class Urbit:
                 # Register the service
                 endpoint = self.config['endpointUrl']
                 api_version = self.config['apiVersion']
-                url = f"https://{endpoint}/{api_version}"
+                url = f"{self.config['endpointScheme']}://{endpoint}/{api_version}"
                 if self.register_urbit(patp, url):
                     # Create the docker container
                     return self.start(patp)
@@ -496,7 +464,7 @@ class Urbit:
                 "meldHour": int(cfg['meld_time'][0:2]),
                 "meldMinute": int(cfg['meld_time'][2:]),
                 "remote": False,
-                "urbitUrl": f"http://{socket.gethostname()}.local:{cfg['http_port']}",
+                "urbitUrl": f"http://{Utils.get_hostname()}.local:{cfg['http_port']}",
                 "minIOUrl": "",
                 "minIOReg": True,
                 "hasBucket": has_bucket,
@@ -574,6 +542,16 @@ class Urbit:
 
         return 400
 
+    # Run a hoon thread over conn.sock, or with click in the container if that isn't there
+    def run_thread(self, patp, name, hoon):
+        res = self.conn.thread(patp, hoon)
+        if res is None:
+            self.create_hoon(patp, name, hoon)
+            raw = Click().click_exec(patp, self.urb_docker.exec, f"{name}.hoon")
+            self.delete_hoon(patp, name)
+            res = Click().to_result(raw)
+        return res
+
     # Create .hoon for pokes
     def create_hoon(self, patp, name, hoon):
         try:
@@ -596,19 +574,43 @@ class Urbit:
             return False
         return True
 
+    # Set upload status, pushed to the websocket
+    def set_upload_status(self, patp, status, progress=None):
+        res = {'status': status}
+        if progress is not None:
+            res['progress'] = progress
+        self.config_object.upload_status[patp] = res
+        self.upload_broadcast(patp)
+
+    def clear_upload_status(self, patp):
+        self.config_object.upload_status.pop(patp, None)
+        self.upload_broadcast(patp)
+
+    # Push a copy, the counters keep changing under it
+    def upload_broadcast(self, patp):
+        if self.ws_util:
+            res = self.config_object.upload_status.get(patp, {'status':'none'})
+            info = dict(res)
+            if 'progress' in res:
+                info['progress'] = dict(res['progress'])
+            self.ws_util.system_broadcast('system', 'upload', patp, info)
+
+    # Set click support, pushed to the websocket when it changes or the pier is added
+    def set_click(self, patp, click):
+        self._urbits[patp]['click'] = click
+        if self.ws_util:
+            self.ws_util.urbit_broadcast(patp, 'click', 'exist', click)
+
     # Get +code from Urbit
     def get_code(self, patp):
         name = "code"
         hoon = "=/  m  (strand ,vase)  ;<  our=@p  bind:m  get-our  ;<  code=@p  bind:m  (scry @p /j/code/(scot %p our))  (pure:m !>((crip (slag 1 (scow %p code)))))"
-        hoon_file = f"{name}.hoon"
-        self.create_hoon(patp, name, hoon)
-        raw = Click().click_exec(patp, self.urb_docker.exec, hoon_file)
-        code = Click().filter_code(raw)
-        self._urbits[patp]['click'] = True
-        self.delete_hoon(patp, name)
+        res = self.run_thread(patp, name, hoon)
+        code = Click().filter_code(res)
+        self.set_click(patp, True)
 
         if not code:
-            self._urbits[patp]['click'] = False
+            self.set_click(patp, False)
             code = ''
             lens_addr = self.get_loopback_addr(patp)
 
@@ -820,18 +822,16 @@ class Urbit:
         Log.log(f"{patp}: Attempting to send |pack")
         # Naming the hoon file
         name = "pack"
-        hoon_file = f"{name}.hoon"
-        self.create_hoon(patp, name, hoon)
-        # Executing the hoon file
-        raw = Click().click_exec(patp, self.urb_docker.exec, hoon_file)
-        pack = Click().filter_success(raw)
+        # Run the thread
+        res = self.run_thread(patp, name, hoon)
+        pack = Click().filter_success(res)
         # Set click support to True
-        self._urbits[patp]['click'] = True
+        self.set_click(patp, True)
         # If pack failed
         if not pack:
             try:
                 # Set click support to False
-                self._urbits[patp]['click'] = False
+                self.set_click(patp, False)
                 data = {"source": {"dojo": "+hood/pack"}, "sink": {"app": "hood"}}
                 with open(f'{self._volume_directory}/{patp}/_data/pack.json','w') as f :
                     json.dump(data, f)
@@ -845,7 +845,6 @@ class Urbit:
 
         # If pack succeeded
         if pack:
-            self.delete_hoon(patp, name)
             try:
                 os.remove(f'{self._volume_directory}/{patp}/_data/pack.json')
             except:
@@ -862,18 +861,16 @@ class Urbit:
         Log.log(f"{patp}: Attempting to send |meld")
         # Naming the hoon file
         name = "meld"
-        hoon_file = f"{name}.hoon"
-        self.create_hoon(patp, name, hoon)
-        # Executing the hoon file
-        raw = Click().click_exec(patp, self.urb_docker.exec, hoon_file)
-        meld = Click().filter_success(raw)
+        # Run the thread
+        res = self.run_thread(patp, name, hoon)
+        meld = Click().filter_success(res)
         # Set click support to True
-        self._urbits[patp]['click'] = True
+        self.set_click(patp, True)
         # If meld failed
         if not meld:
             try:
                 # Set click support to False
-                self._urbits[patp]['click'] = False
+                self.set_click(patp, False)
                 data = {"source": {"dojo": "+hood/meld"}, "sink": {"app": "hood"}}
                 with open(f'{self._volume_directory}/{patp}/_data/meld.json','w') as f :
                     json.dump(data, f)
@@ -887,7 +884,6 @@ class Urbit:
 
         # If meld succeeded
         if meld:
-            self.delete_hoon(patp, name)
             try:
                 os.remove(f'{self._volume_directory}/{patp}/_data/meld.json')
             except:
@@ -915,13 +911,22 @@ class Urbit:
 
     # Get looback address of Urbit Pier
     def get_loopback_addr(self, patp):
-        log = self.urb_docker.full_logs(patp)
-        if log:
-            log_arr = log.decode("utf-8").split('\n')[::-1]
-            substr = 'http: loopback live on'
-            for ln in log_arr:
-                if substr in ln:
-                    return str(ln.split(' ')[-1])
+        c = self.urb_docker.get_container(patp)
+        if not c:
+            return None
+
+        # Cached until the container is started again
+        started = c.attrs['State']['StartedAt']
+        runtime = self._runtime.setdefault(patp, {})
+        if runtime.get('started') == started and runtime.get('loopback'):
+            return runtime['loopback']
+
+        addr = self.urb_docker.find_loopback_addr(patp, started)
+        if addr:
+            Log.log(f"{patp}: Loopback address is {addr}")
+            runtime['started'] = started
+            runtime['loopback'] = addr
+        return addr
 
     # Add urbit ship to GroundSeg
     def add_urbit(self, patp):
@@ -943,76 +948,54 @@ class Urbit:
             if self.wg.get_status(url):
                 self.wg.update_wg_config(self.wg.anchor_data['conf'])
 
-                # Define services
-                urbit_web = False
-                urbit_ames = False
-                minio_svc = False
-                minio_console = False
-                minio_bucket = False
-
-                # Check if service exists for patp
-                for ep in self.wg.anchor_data['subdomains']:
-                    ep_patp = ep['url'].split('.')[-3]
-                    ep_svc = ep['svc_type']
-                    if ep_patp == patp:
-                        if ep_svc == 'urbit-web':
-                            urbit_web = True
-                        if ep_svc == 'urbit-ames':
-                            urbit_ames = True
-                        if ep_svc == 'minio':
-                            minio_svc = True
-                        if ep_svc == 'minio-console':
-                            minio_console = True
-                        if ep_svc == 'minio-bucket':
-                            minio_bucket = True
- 
+                def registered(*svcs):
+                    return None not in [self.wg.anchor.service(patp, s) for s in svcs]
+
+                services = []
                 # One or more of the urbit services is not registered
-                if not (urbit_web and urbit_ames):
+                if not registered('urbit-web', 'urbit-ames'):
                     Log.log(f"{patp}: Registering ship")
-                    self.wg.register_service(f'{patp}', 'urbit', url)
- 
+                    services.append((f'{patp}', 'urbit'))
+
                 # One or more of the minio services is not registered
-                if not (minio_svc and minio_console and minio_bucket):
+                if not registered('minio', 'minio-console', 'minio-bucket'):
                     Log.log(f"{patp}: Registering MinIO")
-                    self.wg.register_service(f's3.{patp}', 'minio', url)
-
-            svc_url = None
-            http_port = None
-            ames_port = None
-            s3_port = None
-            console_port = None
-            tries = 1
-
-            while None in [svc_url,http_port,ames_port,s3_port,console_port]:
-                Log.log(f"{patp}: Checking anchor config if services are ready")
-                if self.wg.get_status(url):
-                    self.wg.update_wg_config(self.wg.anchor_data['conf'])
-
-                Log.log(f"Anchor: {self.wg.anchor_data['subdomains']}")
-                pub_url = '.'.join(self.config['endpointUrl'].split('.')[1:])
-
-                for ep in self.wg.anchor_data['subdomains']:
-                    if ep['status'] == 'ok':
-                        if(f'{patp}.{pub_url}' == ep['url']):
-                            svc_url = ep['url']
-                            http_port = ep['port']
-                        elif(f'ames.{patp}.{pub_url}' == ep['url']):
-                            ames_port = ep['port']
-                        elif(f'bucket.s3.{patp}.{pub_url}' == ep['url']):
-                            s3_port = ep['port']
-                        elif(f'console.s3.{patp}.{pub_url}' == ep['url']):
-                            console_port = ep['port']
-                    else:
-                        t = tries * 2
-                        Log.log(f"Anchor: {ep['svc_type']} not ready. Trying again in {t} seconds.")
-                        time.sleep(t)
-                        if tries <= 15:
-                            tries = tries + 1
-                        break
-
-            return self.set_wireguard_network(patp, svc_url, http_port, ames_port, s3_port, console_port)
+                    services.append((f's3.{patp}', 'minio'))
+
+                if len(services) > 0 and not self.wg.register_services(services, url):
+                    Log.log(f"{patp}: Anchor services couldn't be registered")
+                    return False
+
+            Log.log(f"{patp}: Waiting for anchor services to be ready")
+            if not self.wg.wait_for_anchor(url, lambda d: self.anchor_endpoints(patp) is not None):
+                Log.log(f"{patp}: Anchor services weren't ready in time")
+                return False
+
+            self.wg.update_wg_config(self.wg.anchor_data['conf'])
+            ep = self.anchor_endpoints(patp)
+            return self.set_wireguard_network(patp, ep['url'], ep['http'], ep['ames'], ep['s3'], ep['console'])
         return True
 
+    # Ports for patp once all its endpoints are ok, None until then
+    def anchor_endpoints(self, patp):
+        web = self.wg.anchor.service(patp, 'urbit-web')
+        ames = self.wg.anchor.service(patp, 'urbit-ames')
+        s3 = self.wg.anchor.service(patp, 'minio-bucket')
+        console = self.wg.anchor.service(patp, 'minio-console')
+
+        for ep in [web, ames, s3, console]:
+            if ep is None or ep['status'] != 'ok':
+                return None
+
+        return {
+                'url': web['url'],
+                'http': web['port'],
+                'alias': web['alias'],
+                'ames': ames['port'],
+                's3': s3['port'],
+                'console': console['port']
+                }
+
     def set_wireguard_network(self, patp, url, http_port, ames_port, s3_port, console_port):
         Log.log(f"{patp}: Setting wireguard information")
         try:
@@ -1231,9 +1214,12 @@ class Urbit:
 
     def load_config(self, patp):
         try:
-            with open(f"{self.config_object.base_path}/settings/pier/{patp}.json") as f:
-                cfg = json.load(f)
+            cfg = self.store.load(patp)
+            if cfg is None:
+                raise Exception("no config on disk")
+            else:
                 self._urbits[patp] = {**default_pier_config, **cfg}
+                self.set_click(patp, self._urbits[patp]['click'])
 
                 # Updater Urbit information
                 try:
@@ -1259,10 +1245,7 @@ class Urbit:
 
     def save_config(self, patp):
         try:
-            with open(f"{self.config_object.base_path}/settings/pier/{patp}.json", "w") as f:
-                json.dump(self._urbits[patp], f, indent = 4)
-                Log.log(f"{patp}: Config saved")
-                return True
+            return self.store.save(patp)
         except Exception as e:
             Log.log(f"{patp}: Failed to save config: {e}")
             return False
@@ -1,9 +1,14 @@
+# Python
+import time
+import calendar
+
 # Modules
 import docker
 
 # GroundSeg modules
 from utils import Utils
 from log import Log
+from container_cache import ContainerCache
 
 client = docker.from_env()
 
@@ -27,7 +32,7 @@ class UrbitDocker:
             return "invalid"
 
         # Get container
-        c = self.get_container(patp)
+        c = self.get_container(patp, live=True)
         if not c:
             if self.create(config, image, vol_dir, key):
                 c = self.get_container(patp)
@@ -73,6 +78,7 @@ class UrbitDocker:
                 f.write(script)
                 f.close()
             c.start()
+            ContainerCache.refresh(patp)
             if act == "boot":
                 if self.mode_mismatch(patp, config):
                     if self.remove_container(patp):
@@ -106,6 +112,7 @@ class UrbitDocker:
         if c:
             try:
                 c.stop()
+                ContainerCache.refresh(patp)
             except Exception:
                 Log.log(f"{patp}: Failed to stop container")
                 return False
@@ -113,13 +120,15 @@ class UrbitDocker:
         Log.log(f"{patp}: Container stopped")
         return True
 
-    def get_container(self, patp):
-        try:
-            c = client.containers.get(patp)
-            return c
-        except:
+    def get_container(self, patp, live=False):
+        c = ContainerCache.get(patp, live)
+        if not c:
             Log.log(f"{patp}: Container not found")
-            return False
+        return c
+
+    # All containers by name
+    def list_containers(self):
+        return ContainerCache.list()
 
     def create(self, config, image, vol_dir, key=''):
         patp = config['pier_name']
@@ -144,6 +153,7 @@ class UrbitDocker:
             return True
         try:
             c.remove(force=True)
+            ContainerCache.refresh(patp)
             Log.log(f"{patp}: Container deleted")
             return True
         except Exception as e:
@@ -185,6 +195,41 @@ class UrbitDocker:
             return False
         return c.logs()
 
+    # Read logs from the last container start until the lens address shows up
+    def find_loopback_addr(self, patp, started):
+        c = self.get_container(patp)
+        if not c:
+            return None
+
+        since = None
+        try:
+            since = calendar.timegm(time.strptime(started[:19], "%Y-%m-%dT%H:%M:%S"))
+            if since <= 0:
+                since = None
+        except Exception as e:
+            Log.log(f"{patp}: Unable to read container start time: {e}")
+
+        substr = b'http: loopback live on'
+        stream = None
+        try:
+            stream = c.logs(stream=True, follow=False, since=since)
+            partial = b''
+            for chunk in stream:
+                lines = (partial + chunk).split(b'\n')
+                partial = lines.pop()
+                for ln in lines:
+                    if substr in ln:
+                        return ln.decode("utf-8").strip().split(' ')[-1]
+            if substr in partial:
+                return partial.decode("utf-8").strip().split(' ')[-1]
+        except Exception as e:
+            Log.log(f"{patp}: Failed to read loopback address: {e}")
+        finally:
+            if stream is not None:
+                stream.close()
+
+        return None
+
     def exec(self, patp, command):
         c = self.get_container(patp)
         if c:
@@ -197,7 +242,11 @@ class UrbitDocker:
 
         return False
 
+    # Piers booting together share one pull of the same image
     def _pull_image(self, image, patp):
+        return Utils.single_flight(f"pull:{image}", lambda: self._pull(image, patp))
+
+    def _pull(self, image, patp):
         try:
             Log.log(f"{patp}: Pulling {image}")
             client.images.pull(image)
@@ -263,6 +312,7 @@ class UrbitDocker:
                         detach=True)
 
             if c:
+                ContainerCache.refresh(patp)
                 Log.log(f"{patp}: Successfully built container")
                 return True
             else:
@@ -5,7 +5,8 @@ import socket
 import psutil
 import hashlib
 import subprocess
-from time import sleep
+from time import sleep, monotonic
+from threading import Lock, Event
 
 # Modules
 import nmcli
@@ -17,8 +18,51 @@ import start_script
 import pack_script
 import meld_script
 from log import Log
+from patp import Patp
 
 class Utils:
+    # Cached hostname and when it was read
+    _hostname = None
+    _hostname_read = 0
+    _hostname_ttl = 60
+
+    # Calls in progress for single_flight
+    _flights = {}
+    _flights_lock = Lock()
+
+    # Run fn once for concurrent callers using the same key, share the result
+    def single_flight(key, fn):
+        with Utils._flights_lock:
+            flight = Utils._flights.get(key)
+            owner = flight is None
+            if owner:
+                flight = {"done": Event(), "result": None, "error": None}
+                Utils._flights[key] = flight
+
+        if not owner:
+            flight['done'].wait()
+        else:
+            try:
+                flight['result'] = fn()
+            except Exception as e:
+                flight['error'] = e
+            finally:
+                with Utils._flights_lock:
+                    Utils._flights.pop(key, None)
+                flight['done'].set()
+
+        if flight['error'] is not None:
+            raise flight['error']
+        return flight['result']
+
+    # Hostname, reread at most once per ttl
+    def get_hostname():
+        now = monotonic()
+        if Utils._hostname is None or now - Utils._hostname_read > Utils._hostname_ttl:
+            Utils._hostname = socket.gethostname()
+            Utils._hostname_read = now
+        return Utils._hostname
+
     def make_hash(file):
         h  = hashlib.sha256()
         b  = bytearray(128*1024)
@@ -29,44 +73,7 @@ class Utils:
         return h.hexdigest()
 
     def check_patp(patp):
-        # Make sure patp is string
-        if type(patp) != str:
-            return False
-
-        # Remove sig from patp
-        if patp.startswith("~"):
-            patp = patp[1:]
-
-        # patps cannot start with doz
-        if patp.startswith("doz"):
-            return False
-
-        # valid
-        pre = "dozmarbinwansamlitsighidfidlissogdirwacsabwissibrigsoldopmodfoglidhopdardorlorhodfolrintogsilmirholpaslacrovlivdalsatlibtabhanticpidtorbolfosdotlosdilforpilramtirwintadbicdifrocwidbisdasmidloprilnardapmolsanlocnovsitnidtipsicropwitnatpanminritpodmottamtolsavposnapnopsomfinfonbanmorworsipronnorbotwicsocwatdolmagpicdavbidbaltimtasmalligsivtagpadsaldivdactansidfabtarmonranniswolmispallasdismaprabtobrollatlonnodnavfignomnibpagsopralbilhaddocridmocpacravripfaltodtiltinhapmicfanpattaclabmogsimsonpinlomrictapfirhasbosbatpochactidhavsaplindibhosdabbitbarracparloddosbortochilmactomdigfilfasmithobharmighinradmashalraglagfadtopmophabnilnosmilfopfamdatnoldinhatnacrisfotribhocnimlarfitwalrapsarnalmoslandondanladdovrivbacpollaptalpitnambonrostonfodponsovnocsorlavmatmipfip"
-        suf = "zodnecbudwessevpersutletfulpensytdurwepserwylsunrypsyxdyrnuphebpeglupdepdysputlughecryttyvsydnexlunmeplutseppesdelsulpedtemledtulmetwenbynhexfebpyldulhetmevruttylwydtepbesdexsefwycburderneppurrysrebdennutsubpetrulsynregtydsupsemwynrecmegnetsecmulnymtevwebsummutnyxrextebfushepbenmuswyxsymselrucdecwexsyrwetdylmynmesdetbetbeltuxtugmyrpelsyptermebsetdutdegtexsurfeltudnuxruxrenwytnubmedlytdusnebrumtynseglyxpunresredfunrevrefmectedrusbexlebduxrynnumpyxrygryxfeptyrtustyclegnemfermertenlusnussyltecmexpubrymtucfyllepdebbermughuttunbylsudpemdevlurdefbusbeprunmelpexdytbyttyplevmylwedducfurfexnulluclennerlexrupnedlecrydlydfenwelnydhusrelrudneshesfetdesretdunlernyrsebhulrylludremlysfynwerrycsugnysnyllyndyndemluxfedsedbecmunlyrtesmudnytbyrsenwegfyrmurtelreptegpecnelnevfes"
-
-        # convert to array
-        pre = [pre[i:i+3] for i in range(0, len(pre), 3)]
-        suf = [suf[i:i+3] for i in range(0, len(suf), 3)]
-
-        # Galaxy check
-        if len(patp) == 3:
-            return patp in suf
-
-        # Split patp
-        patp = patp.split("-")
-
-        # Check if valid
-        for p in patp:
-            if len(p) == 6:
-                if p[:3] not in pre:
-                    return False
-                if p[3:] not in suf:
-                    return False
-            else:
-                return False
-
-        return True
+        return Patp.check(patp)
 
     def convert_region_data(data):
         try:
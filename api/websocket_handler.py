@@ -6,6 +6,9 @@ from threading import Thread
 from log import Log
 
 class GSWebSocket(Thread):
+    # Collect bursts of changes into one frame
+    coalesce = 0.05
+
     def __init__(self, config, orchestrator, ws_util, host='0.0.0.0', port=8000):
         super().__init__()
         self.config_class = config
@@ -14,6 +17,10 @@ class GSWebSocket(Thread):
         self.ws_util = ws_util
         self.host = host
         self.port = port
+        self.log_subscribers = {}
+
+        # client -> ws_util version it last received
+        self.client_versions = {}
 
     async def handle(self, websocket, path):
         try:
@@ -23,10 +30,12 @@ class GSWebSocket(Thread):
                 msg = "default-fail"
                 try:
                     # Check authentication
-                    valid = data['sessionid'] in self.config['sessions']
+                    valid = self.config_class.sessions.check(data['sessionid'])
                     if valid:
                         # Add client to connected clients set
-                        self.orchestrator.authorized_clients.add(websocket)
+                        if websocket not in self.orchestrator.authorized_clients:
+                            self.orchestrator.authorized_clients.add(websocket)
+                            self.ws_util.wake()
                         msg = "client added"
                     else:
                         raise Exception("no sessionid provided")
@@ -39,6 +48,13 @@ class GSWebSocket(Thread):
                     # If valid ping, return received
                     if data['category'] == 'ping':
                         msg = "authenticated"
+                    elif data['category'] == 'logs':
+                        try:
+                            msg = await self.logs_command(websocket, data['payload'])
+                        except Exception as e:
+                            Log.log(f"WS: Failed to run logs command: {e}")
+                            valid = False
+                            msg = "logs:operation-fail"
                     else:
                         try:
                             msg = self.orchestrator.ws_command(data)
@@ -54,41 +70,88 @@ class GSWebSocket(Thread):
             Log.log("WS: Connection closed")
 
         finally:
+            # Stop pushing logs to this client
+            self.logs_unsubscribe_all(websocket)
+
             # Remove client from connected clients set
+            self.client_versions.pop(websocket, None)
             self.orchestrator.authorized_clients.remove(websocket)
 
+    # Subscribe a client to container log lines
+    async def logs_command(self, websocket, payload):
+        container = payload['container']
+        action = payload['action']
+        streamer = self.orchestrator.log_streamer
+        subs = self.log_subscribers.setdefault(websocket, {})
+
+        if not self.orchestrator.log_container(container):
+            raise Exception(f"'{container}' is not a valid container")
+
+        if action == "subscribe":
+            if container not in subs:
+                loop = asyncio.get_running_loop()
+
+                def push(name, lines, total):
+                    msg = json.dumps({"logs": {name: {"lines": lines, "total": total}}})
+                    asyncio.run_coroutine_threadsafe(websocket.send(msg), loop)
+
+                subs[container] = push
+                lines, total = await loop.run_in_executor(None, streamer.subscribe, container, push)
+
+                # send what the client doesn't have yet
+                first = total - len(lines)
+                have = int(payload.get('haveLine', 0))
+                push(container, lines[max(have - first, 0):], total)
+
+        if action == "unsubscribe":
+            if container in subs:
+                streamer.unsubscribe(container, subs.pop(container))
+
+        return "succeeded"
+
+    def logs_unsubscribe_all(self, websocket):
+        subs = self.log_subscribers.pop(websocket, {})
+        for container, push in subs.items():
+            self.orchestrator.log_streamer.unsubscribe(container, push)
+
     async def broadcast_message(self):
         while True:
+            # Sleep until something changes
+            await self.ws_util.changed.wait()
+            self.ws_util.changed.clear()
+            await asyncio.sleep(self.coalesce)
             try:
+                # serialized once per version, shared by every client
+                messages = {}
                 for client in self.orchestrator.authorized_clients.copy():
                     if client.open:
-                        message = self.ws_util.structure
-                        await client.send(json.dumps(message))
+                        since = self.client_versions.get(client)
+                        if since == self.ws_util.version:
+                            continue
+
+                        # full structure once, then only changes
+                        if since not in messages:
+                            if since is None:
+                                messages[since] = self.ws_util.snapshot()
+                            else:
+                                messages[since] = self.ws_util.patch(since)
+
+                        version, message = messages[since]
+                        if message is not None:
+                            await client.send(message)
+                        self.client_versions[client] = version
                     else:
                         self.orchestrator.authorized_clients.remove(client)
+                        self.client_versions.pop(client, None)
             except Exception as e:
                 Log.log(f"WS: Broadcast fail: {e}")
-            await asyncio.sleep(0.5)  # Send the message twice a second
-
-    async def urbits_broadcast(self):
-        while True:
-            try:
-                for patp in self.orchestrator.urbit._urbits.copy():
-                    try:
-                        click = self.orchestrator.urbit._urbits[patp]['click']
-                    except:
-                        click = False
-                    self.ws_util.urbit_broadcast(patp, 'click', 'exist', click)
-            except Exception as e:
-                Log.log(f"WS: Urbits Broadcast fail: {e}")
-            await asyncio.sleep(1)
 
     def run(self):
         try:
             Log.log("WS: Starting WebSocket Thread")
             asyncio.set_event_loop(asyncio.new_event_loop())
+            self.ws_util.attach(asyncio.get_event_loop())
             server = websockets.serve(self.handle, self.host, self.port)
-            asyncio.get_event_loop().create_task(self.urbits_broadcast())
             asyncio.get_event_loop().create_task(self.broadcast_message())
             asyncio.get_event_loop().run_until_complete(server)
             asyncio.get_event_loop().run_forever()
@@ -1,15 +1,17 @@
 import json
 import base64
-import requests
-from time import sleep
 
 # GroundSeg modules
 from log import Log
+from startram_api import StarTramAPI
+from anchor_status import AnchorStatus
 from wireguard_docker import WireguardDocker
 
 class Wireguard:
 
-    _headers = {"Content-Type": "application/json"}
+    # Tries at /create before giving up on a registration
+    _create_tries = 6
+
     data = {}
     updater_info = {}
     default_config = {
@@ -27,10 +29,13 @@ class Wireguard:
         self.config_object = config
         self.config = config.config
         self.filename = f"{self.config_object.base_path}/settings/wireguard.json"
-        self.anchor_data = {}
         self.region_data = {}
         self._volume_directory = f"{self.config['dockerData']}/volumes"
         self.wg_docker = WireguardDocker()
+        self.api = StarTramAPI()
+
+        # /retrieve, cached and shared
+        self.anchor = AnchorStatus(self.api, self.config)
 
         # Set Wireguard Config
         self.load_config()
@@ -69,6 +74,11 @@ class Wireguard:
 
         Log.log("Wireguard: Initialization Completed")
 
+    # Latest /retrieve response
+    @property
+    def anchor_data(self):
+        return self.anchor.data
+
     # Start container
     def start(self):
         return self.wg_docker.start(self.data, self.config_object._arch)
@@ -110,7 +120,7 @@ class Wireguard:
 
         endpoint = self.config['endpointUrl']
         api_version = self.config['apiVersion']
-        url = f'https://{endpoint}/{api_version}'
+        url = f"{self.config['endpointScheme']}://{endpoint}/{api_version}"
 
         if self.get_status(url):
             self.update_wg_config(self.anchor_data['conf'])
@@ -176,7 +186,7 @@ class Wireguard:
         Log.log(f"Wireguard: Attempting to change endopint url to {url}")
         endpoint = self.config['endpointUrl']
         api_version = self.config['apiVersion']
-        old_url = f'https://{endpoint}/{api_version}'
+        old_url = f"{self.config['endpointScheme']}://{endpoint}/{api_version}"
         self.config['endpointUrl'] = url
         self.config['wgRegistered'] = False
         self.config['wgOn'] = False
@@ -191,8 +201,8 @@ class Wireguard:
         self.config_object.save_config()
         if self.config['endpointUrl'] == url:
             self.region_data = {}
-            self.anchor_data = {}
-            self.get_regions(f"https://{url}/{api_version}")
+            self.anchor.reset()
+            self.get_regions(f"{self.config['endpointScheme']}://{url}/{api_version}")
             return 200
         return 400
 
@@ -227,7 +237,8 @@ class Wireguard:
         try:
             update_data = {"reg_code" : reg_key,"pubkey":self.config['pubkey'],"region":region}
 
-            res = requests.post(f'{url}/register',json=update_data,headers=self._headers).json()
+            res = self.api.register(url, update_data)
+            self.anchor.invalidate()
             Log.log(f"Anchor: /register response: {res}")
             if res['error'] != 0:
                 raise Exception(f"error not 0: {res}")
@@ -243,83 +254,48 @@ class Wireguard:
     def get_regions(self, url, tries=3):
         Log.log("Anchor: Attempting to get regions")
         self.region_data = {}
-        full_url = f"{url}/regions"
-        err_count = 0
-        while err_count < tries:
-            try:
-                self.region_data = requests.get(full_url,headers=self._headers).json()
-                return True
-
-            except Exception as e:
-                Log.log(f"Anchor: /regions failed: {e}")
-                if not (tries - err_count == 1):
-                    t = err_count * 2
-                    Log.log(f"Anchor: Attempting /regions again in {t} seconds")
-                    sleep(t)
-                err_count = err_count + 1
-        return False
-
-    # /v1/retrieve
-    def get_status(self, url):
-        full_url = f"{url}/retrieve?pubkey={self.config['pubkey']}"
-        err_count = 0
-        while err_count < 6:
-            try:
-                data = requests.get(full_url,headers=self._headers).json()
-                if data["conf"] is not None:
-                    self.anchor_data = data
-                    return True
-                raise Exception(f"conf is null: {data}")
-
-            except Exception as e:
-                Log.log(f"Anchor: /retrieve failed: {e}")
-                t = err_count * 2
-                Log.log(f"Anchor: Attempting /retrieve again in {t} seconds")
-                sleep(t)
-                err_count = err_count + 1
-
+        try:
+            self.region_data = self.api.regions(url, tries)
+            return True
+        except Exception as e:
+            Log.log(f"Anchor: /regions failed: {e}")
         return False
 
-    # /v1/create
-    def register_service(self, subdomain, service_type, url):
-        update_data = {
-            "subdomain" : f"{subdomain}",
-            "pubkey":self.config['pubkey'],
-            "svc_type": service_type
-        }
-        headers = {"Content-Type": "application/json"}
-
-        response = False
-        while not response:
-            try:
-                response = requests.post(f'{url}/create',json=update_data,headers=headers).json()
-                Log.log(f"Anchor: Sent creation request for {service_type}")
-            except Exception as e:
-                Log.log(f"Anchor: Failed to register service {service_type}: {e}")
-        
-        # wait for it to be created
-        while response['status'] == 'creating':
+    # /v1/retrieve, answered from the cache when it's younger than max_age
+    def get_status(self, url, max_age=None):
+        return self.anchor.get(url, max_age) is not None
+
+    # /v1/create for a batch of (subdomain, svc_type), returns False if any failed
+    def register_services(self, services, url):
+        ok = True
+        for subdomain, service_type in services:
+            update_data = {
+                "subdomain" : f"{subdomain}",
+                "pubkey":self.config['pubkey'],
+                "svc_type": service_type
+            }
             try:
-                response = requests.get(
-                        f'{url}/retrieve?pubkey={update_data["pubkey"]}',
-                        headers=headers).json()
-                Log.log(f"Anchor: Retrieving response for {service_type}")
+                # a rejected /create comes back as json, not an exception
+                response = self.api.create(url, update_data, tries=self._create_tries)
+                if response is None or response.get('error') != 0:
+                    debug = None if response is None else response.get('debug')
+                    raise Exception(f"rejected: {debug}")
+                Log.log(f"Anchor: Sent creation request for {service_type} {subdomain}")
             except Exception as e:
-                Log.log(f"Anchor: Failed to retrieve response: {e}")
+                Log.log(f"Anchor: Failed to register service {service_type} {subdomain}: {e}")
+                ok = False
+        self.anchor.invalidate()
+        return ok
 
-            if(response['status'] == 'creating'):
-                Log.log("Anchor: Waiting for endpoint to be created")
-                sleep(60)
-
-        return response['status']
+    # Wait until ready(anchor_data) is true
+    def wait_for_anchor(self, url, ready, timeout=900):
+        return self.anchor.wait_for(url, ready, timeout)
 
     # /v1/create/alias
     def handle_alias(self, patp, alias, req_type):
         endpoint = self.config['endpointUrl']
         api_version = self.config['apiVersion']
-        url = f"https://{endpoint}/{api_version}"
-
-        headers = {"Content-Type": "application/json"}
+        url = f"{self.config['endpointScheme']}://{endpoint}/{api_version}"
 
         blob = {
             "subdomain": patp,
@@ -328,20 +304,22 @@ class Wireguard:
         }
         if req_type == 'post':
             try:
-                response = requests.post(f'{url}/create/alias',json=blob,headers=headers).json()
+                response = self.api.alias(url, blob, 'post')
                 Log.log(f"Anchor: Sent alias {alias} creation request for {patp}")
                 Log.log(f"Anchor: {response}")
                 if response['error'] == 0:
+                    self.anchor.invalidate()
                     return True
             except Exception as e:
                 Log.log(f"Anchor: Failed to register alias {alias} for {patp}: {e}")
 
         elif req_type == 'delete':
             try:
-                response = requests.delete(f'{url}/create/alias',json=blob,headers=headers).json()
+                response = self.api.alias(url, blob, 'delete')
                 Log.log(f"Anchor: Sent alias {alias} deletion request for {patp}")
                 Log.log(f"Anchor: {response}")
                 if response['error'] == 0:
+                    self.anchor.invalidate()
                     return True
             except Exception as e:
                 Log.log(f"Anchor: Failed to delete alias {alias} for {patp}: {e}")
@@ -356,10 +334,10 @@ class Wireguard:
             "pubkey":self.config['pubkey'],
             "svc_type": service_type
         }
-        headers = {"Content-Type": "application/json"}
 
         try:
-            response = requests.post(f'{url}/delete',json=update_data,headers=headers).json()
+            response = self.api.delete(url, update_data)
+            self.anchor.invalidate()
             Log.log(f"Anchor: Service {service_type} deleted: {response}")
         except Exception:
             Log.log(f"Anchor: Failed to delete service {service_type}")
@@ -368,14 +346,13 @@ class Wireguard:
     # /v1/stripe/cancel
     def cancel_subscription(self, reg_key, url):
         Log.log("Anchor: Attempting to cancel subscription")
-        headers = {"Content-Type": "application/json"}
         data = {'reg_code': reg_key}
         response = None
 
         try:
-            response = requests.post(f'{url}/stripe/cancel',json=data,headers=headers).json()
+            response = self.api.cancel(url, data)
             if response['error'] == 0:
-                if self.get_status(url):
+                if self.get_status(url, max_age=0):
                     Log.log("Anchor: Successfully canceled subscription")
                     return 200
 
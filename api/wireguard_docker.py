@@ -1,5 +1,6 @@
 import docker
 from log import Log
+from container_cache import ContainerCache
 
 client = docker.from_env()
 
@@ -15,7 +16,7 @@ class WireguardDocker:
             image = f"{image}@sha256:{config[sha]}"
 
         Log.log("Wireguard: Attempting to start container")
-        c = self.get_container(name)
+        c = self.get_container(name, live=True)
         if not c:
             c = self._create_container(name, image, config)
             if not c:
@@ -34,6 +35,7 @@ class WireguardDocker:
 
         try:
             c.start()
+            ContainerCache.refresh(name)
             Log.log("Wireguard: Successfully started container")
             return True
         except:
@@ -50,6 +52,7 @@ class WireguardDocker:
             return False
         try:
             c.stop()
+            ContainerCache.refresh(name)
             Log.log("Wireguard: Successfully stopped container")
             return True
         except:
@@ -99,6 +102,7 @@ class WireguardDocker:
             return False
         else:
             c.remove(force=True)
+            ContainerCache.refresh(name)
             Log.log("Wireguard: Successfully removed container")
             return True
 
@@ -115,13 +119,11 @@ class WireguardDocker:
             return False
 
 
-    def get_container(self, name):
-        try:
-            c = client.containers.get(name)
-            return c
-        except:
+    def get_container(self, name, live=False):
+        c = ContainerCache.get(name, live)
+        if not c:
             Log.log("Wireguard: Container not found")
-            return False
+        return c
 
 
     def _create_container(self, name, image, config):
@@ -185,6 +187,7 @@ class WireguardDocker:
                     cap_add = cap_add,
                     sysctls = sysctls,
                     detach=True)
+            ContainerCache.refresh(name)
             return c
 
         except Exception as e:
@@ -1,9 +1,9 @@
 # Python
 import time
-import requests
 
 # GroundSeg modules
 from log import Log
+from health_prober import HealthProber
 
 class WireguardRefresher:
     def __init__(self, config, orchestrator):
@@ -13,19 +13,16 @@ class WireguardRefresher:
         self.wireguard = self.orchestrator.wireguard
         self.urbit = self.orchestrator.urbit
         self.minio = self.orchestrator.minio
-        self.failed = []
+        self.prober = HealthProber()
 
     # Checks if wireguard connection is functional, restarts wireguard
     def refresh_loop(self):
         Log.log("WG Refresher: Thread started")
-        count = 0
         while True:
-            if count > 1:
-                count = 0
-                self.failed = []
             try:
                 if self.config['wgOn'] and self.config_object.anchor_ready:
                     copied = self.urbit._urbits
+                    targets = {}
                     for p in list(copied):
                         running = False
 
@@ -33,24 +30,16 @@ class WireguardRefresher:
                         if c:
                             running = c.status == "running"
                         if running and copied[p]['network'] != "none":
-                            res = requests.get(f"https://{copied[p]['wg_url']}/~_~/healthz")
-                            if res.status_code == 502:
-                                if self.failure_check(p):
-                                    Log.log("WG Refresher: Anchor connection is broken. Restarting")
-                                    self.failed = []
-                                    self.wireguard.restart(self.urbit, self.minio)
-                                    break
+                            targets[p] = copied[p]['wg_url']
+
+                    self.prober.probe_all(targets)
+                    broken = [p for p in targets if self.prober.failing(p)]
+                    if len(broken) > 0:
+                        Log.log(f"WG Refresher: Anchor connection is broken for {', '.join(broken)}. Restarting")
+                        self.prober.reset()
+                        self.wireguard.restart(self.urbit, self.minio)
 
             except Exception as e:
                 Log.log(f"WG Refresher: {e}")
 
-            count += 1
             time.sleep(60)
-
-    def failure_check(self, p):
-        if p in self.failed:
-            return True
-        else:
-            self.failed.append(p)
-            return False
-
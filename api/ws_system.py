@@ -38,6 +38,12 @@ class WSSystem:
         self.ws_util.system_broadcast('system','startram',"cancel","hide")
         self.ws_util.system_broadcast('system','startram',"advanced",False)
 
+    # Anchor subscriber for region, lease and ongoing, push them to the UI
+    def anchor_changed(self, data):
+        self.ws_util.system_broadcast('system','startram',"region",data.get('region'))
+        self.ws_util.system_broadcast('system','startram',"expiry",data.get('lease'))
+        self.ws_util.system_broadcast('system','startram',"autorenew",data.get('ongoing') == 1)
+
     #
     #   Actions
     #
@@ -1,10 +1,34 @@
 import json
+import asyncio
+from threading import Lock
 
 from log import Log
 
 class WSUtil:
     structure = {}
 
+    def __init__(self):
+        # Bumped on every change to structure
+        self.version = 0
+
+        # path -> version it last changed in
+        self._changed = {}
+        self._lock = Lock()
+
+        # Set on the websocket loop when structure changes
+        self._loop = None
+        self.changed = None
+
+    # Called from the websocket thread once its loop exists
+    def attach(self, loop):
+        self.changed = asyncio.Event()
+        self._loop = loop
+
+    # Wake the broadcaster, safe from any thread
+    def wake(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.changed.set)
+
     # send activity response
     def make_activity(self, aid, success, msg):
         if success:
@@ -13,6 +37,42 @@ class WSUtil:
             res = {"activity":{aid:{"message":msg,"error": 1}}}
         return json.dumps(res)
 
+    # Full structure for newly connected clients
+    def snapshot(self):
+        with self._lock:
+            return self.version, json.dumps(self.structure)
+
+    # Only the paths that changed after version since
+    def patch(self, since):
+        with self._lock:
+            changes = {}
+            for path, ver in self._changed.items():
+                if ver > since:
+                    try:
+                        value = self.structure
+                        for key in path:
+                            value = value[key]
+                    except (KeyError, TypeError):
+                        continue
+                    branch = changes
+                    for key in path[:-1]:
+                        branch = branch.setdefault(key, {})
+                    branch[path[-1]] = value
+
+            if len(changes) < 1:
+                return self.version, None
+            return self.version, json.dumps(changes)
+
+    # Record a change
+    def _set(self, root, path, info):
+        key = path[-1]
+        if key in root and root[key] == info:
+            return
+        root[key] = info
+        self.version += 1
+        self._changed[path] = self.version
+        self.wake()
+
     # Broadcast action for System and Updates
     def system_broadcast(self, category, module, action, info=""):
         try:
@@ -21,22 +81,23 @@ class WSUtil:
             if category not in whitelist:
                 raise Exception(f"Error. Category '{category}' not in whitelist")
 
-            # Category
-            try:
-                if not self.structure.get(category) or not isinstance(self.structure[category], dict):
-                    self.structure[category] = {}
-            except Exception as e:
-                raise Exception(f"failed to set category '{category}': {e}") 
+            with self._lock:
+                # Category
+                try:
+                    if not self.structure.get(category) or not isinstance(self.structure[category], dict):
+                        self.structure[category] = {}
+                except Exception as e:
+                    raise Exception(f"failed to set category '{category}': {e}")
 
-            # Module
-            try:
-                if not self.structure[category].get(module) or not isinstance(self.structure[category], dict):
-                    self.structure[category][module] = {}
-            except Exception as e:
-                raise Exception(f"failed to set module '{module}': {e}") 
+                # Module
+                try:
+                    if not self.structure[category].get(module) or not isinstance(self.structure[category], dict):
+                        self.structure[category][module] = {}
+                except Exception as e:
+                    raise Exception(f"failed to set module '{module}': {e}")
 
-            # Action
-            self.structure[category][module][action] = info
+                # Action
+                self._set(self.structure[category][module], (category, module, action), info)
 
         except Exception as e:
             Log.log(f"ws-util:system-broadcast {e}")
@@ -47,28 +108,29 @@ class WSUtil:
     # Broadcast action for Urbits
     def urbit_broadcast(self, patp, module, action, info=""):
         try:
-            # Set root to structure
-            root = self.structure
-            # Category
-            if not self.structure.get('urbits') or not isinstance(self.structure['urbits'], dict):
-                self.structure['urbits'] = {}
-
-            # Set root to urbits
-            root = root['urbits']
-            # Patp
-            if not root.get(patp) or not isinstance(root[patp], dict):
-                root[patp] = {}
-
-            # Set root to patp
-            root = root[patp]
-            # Module
-            if not root.get(module) or not isinstance(root[module], dict):
-                root[module] = {}
-
-            # Set root to patp
-            root = root[module]
-            # Action
-            root[action] = info
+            with self._lock:
+                # Set root to structure
+                root = self.structure
+                # Category
+                if not self.structure.get('urbits') or not isinstance(self.structure['urbits'], dict):
+                    self.structure['urbits'] = {}
+
+                # Set root to urbits
+                root = root['urbits']
+                # Patp
+                if not root.get(patp) or not isinstance(root[patp], dict):
+                    root[patp] = {}
+
+                # Set root to patp
+                root = root[patp]
+                # Module
+                if not root.get(module) or not isinstance(root[module], dict):
+                    root[module] = {}
+
+                # Set root to patp
+                root = root[module]
+                # Action
+                self._set(root, ('urbits', patp, module, action), info)
 
         except Exception as e:
             Log.log(f"ws-util:urbit-broadcast {e}")